@@ -48,9 +48,8 @@ if [ "$DEPLOYMENT_TYPE" = "local" ]; then
         log_warning "Отредактируйте .env файл при необходимости"
     fi
 
-    # Остановка и запуск
+    # Запуск: up -d пересоздает только изменившиеся сервисы
     log_info "🔄 Запускаю сервисы..."
-    docker-compose -f docker-compose.local.yml down 2>/dev/null || true
     docker-compose -f docker-compose.local.yml up -d
 
     # Ожидание готовности
@@ -86,13 +85,15 @@ fi
 
 # Кластерное развертывание  
 if [ "$DEPLOYMENT_TYPE" = "cluster" ]; then
-    # Проверка инструментов
+    # Проверка инструментов: одна проходка встроенным command -v, без запуска --version
+    missing_tools=()
     for tool in kubectl helm ansible; do
-        if ! command -v $tool >/dev/null 2>&1; then
-            log_error "Установите $tool для кластерного развертывания"
-            exit 1
-        fi
+        command -v $tool >/dev/null 2>&1 || missing_tools+=("$tool")
     done
+    if [ ${#missing_tools[@]} -gt 0 ]; then
+        log_error "Установите ${missing_tools[*]} для кластерного развертывания"
+        exit 1
+    fi
 
     # Проверка inventory
     if [ ! -f "ansible/cluster-inventory.yml" ]; then
@@ -7,8 +7,9 @@ AI Box Development Environment
 
 import os
 import sys
+import socket
 import subprocess
-import threading
+import selectors
 import time
 import signal
 from pathlib import Path
@@ -16,16 +17,26 @@ from pathlib import Path
 class ServiceManager:
     def __init__(self):
         self.processes = {}
+        self.ports = {}
         self.running = True
+        # Один селектор читает stdout всех сервисов вместо потока на процесс
+        self.selector = selectors.DefaultSelector()
+        self.output_buffers = {}
         
     def start_service(self, name, command, port, cwd=None):
-        """Запуск сервиса в отдельном процессе"""
-        print(f"🚀 Запускаю {name} на порту {port}")
+        """Запуск сервиса в отдельном процессе.
+
+        command - список аргументов; без shell, cwd и закрытия fd subprocess
+        запускает процесс через posix_spawn вместо fork всего интерпретатора.
+        port - порт или список портов, если процесс слушает несколько.
+        """
+        ports = list(port) if isinstance(port, (list, tuple)) else [port]
+        print(f"🚀 Запускаю {name} на порту {', '.join(map(str, ports))}")
         
         env = os.environ.copy()
         env.update({
             'HOST': '0.0.0.0',
-            'PORT': str(port),
+            'PORT': str(ports[0]),
             'ENVIRONMENT': 'development',
             'DATABASE_URL': 'sqlite:///./aibox_dev.db',
             'OLLAMA_API_BASE': 'http://0.0.0.0:11434',
@@ -39,28 +50,55 @@ class ServiceManager:
         try:
             process = subprocess.Popen(
                 command,
-                shell=True,
                 cwd=cwd,
                 env=env,
+                close_fds=False,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
-                universal_newlines=True,
-                bufsize=1
+                bufsize=0
             )
             self.processes[name] = process
-            
-            # Мониторинг вывода в отдельном потоке
-            def monitor_output():
-                for line in process.stdout:
-                    if self.running:
-                        print(f"[{name}] {line.strip()}")
-                        
-            thread = threading.Thread(target=monitor_output, daemon=True)
-            thread.start()
+            self.ports[name] = ports
+            self.output_buffers[name] = b""
+            self.selector.register(process.stdout, selectors.EVENT_READ, name)
             
         except Exception as e:
             print(f"❌ Ошибка запуска {name}: {e}")
     
+    def pump_output(self, timeout=1.0):
+        """Вывод накопившихся строк всех сервисов; ждет не дольше timeout"""
+        for key, _ in self.selector.select(timeout):
+            name = key.data
+            chunk = os.read(key.fd, 65536)
+            if not chunk:
+                # EOF: процесс закрыл stdout
+                self.selector.unregister(key.fileobj)
+                chunk = b"\n"
+            
+            *lines, self.output_buffers[name] = (self.output_buffers[name] + chunk).split(b"\n")
+            if self.running:
+                for line in lines:
+                    if line.strip():
+                        print(f"[{name}] {line.decode(errors='replace').rstrip()}")
+    
+    def wait_until_ready(self, timeout=30.0):
+        """Ожидание, пока порты всех сервисов начнут принимать соединения"""
+        pending = [(name, port) for name, ports in self.ports.items() for port in ports]
+        deadline = time.monotonic() + timeout
+        delay = 0.02
+        while pending and time.monotonic() < deadline:
+            for name, port in list(pending):
+                try:
+                    socket.create_connection(("127.0.0.1", port), timeout=0.05).close()
+                    pending.remove((name, port))
+                except OSError:
+                    pass
+            if pending:
+                # Экспоненциальная пауза между опросами; логи сервисов выводятся и во время ожидания
+                self.pump_output(delay)
+                delay = min(delay * 1.5, 0.25)
+        return pending
+    
     def start_all_services(self):
         """Запуск всех сервисов AI Box"""
         
@@ -68,63 +106,43 @@ class ServiceManager:
         if Path("services/gateway/main.py").exists():
             self.start_service(
                 "Gateway",
-                "python -m uvicorn main:app --host 0.0.0.0 --port 5000",
-                5000,
-                cwd="services/gateway"
+                [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", "services/gateway",
+                 "--host", "0.0.0.0", "--port", "5000"],
+                5000
             )
         else:
             # Demo Gateway
             self.start_service(
                 "Demo Gateway", 
-                "python demo_gateway.py", 
+                [sys.executable, "demo_gateway.py"], 
                 5000
             )
         
-        
-        time.sleep(1)
-        
-        # 2. RAG Service - используем мок для упрощения тестирования
-        self.start_service(
-            "RAG Service (Mock)",
-            "python sandbox_dev/mock_rag.py",
-            8001
-        )
-        
-        time.sleep(1)
+        # 2. Моки RAG, Ollama и Qdrant - один процесс, каждый на своем порту
+        mocks = {"rag": 8001, "ollama": 11434, "qdrant": 6333}
         
         # 3. Agents Service
         if Path("services/agents/main.py").exists():
             self.start_service(
                 "Agents Service",
-                "python -m uvicorn main:app --host 0.0.0.0 --port 8002",
-                8002,
-                cwd="services/agents"
+                [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", "services/agents",
+                 "--host", "0.0.0.0", "--port", "8002"],
+                8002
             )
         else:
             # Мок Agents сервиса
-            self.start_service(
-                "Agents Service (Mock)",
-                "python sandbox_dev/mock_agents.py",
-                8002
-            )
+            mocks["agents"] = 8002
         
-        time.sleep(1)
-        
-        # 4. Ollama Mock (если нет реального)
         self.start_service(
-            "Ollama Mock",
-            "python sandbox_dev/mock_ollama.py",
-            11434
+            "Mocks",
+            [sys.executable, "sandbox_dev/mock_all.py", *mocks],
+            list(mocks.values())
         )
         
-        time.sleep(1)
-        
-        # 5. Qdrant Mock (если нет реального)
-        self.start_service(
-            "Qdrant Mock",
-            "python sandbox_dev/mock_qdrant.py",
-            6333
-        )
+        # Готовность определяется по открытым портам, а не фиксированными паузами
+        not_ready = self.wait_until_ready()
+        for name, port in not_ready:
+            print(f"⚠️ {name} не отвечает на порту {port}")
         
         print("\n✅ Все сервисы запущены!")
         print("🌐 Gateway: http://localhost:5000")
@@ -136,6 +154,7 @@ class ServiceManager:
     def stop_all(self):
         """Остановка всех сервисов"""
         self.running = False
+        self.selector.close()
         print("\n🛑 Останавливаю все сервисы...")
         
         for name, process in self.processes.items():
@@ -165,9 +184,12 @@ if __name__ == "__main__":
     try:
         manager.start_all_services()
         
-        # Держим главный процесс активным
+        # Держим главный процесс активным и выводим логи сервисов
         while manager.running:
-            time.sleep(1)
+            if manager.selector.get_map():
+                manager.pump_output()
+            else:
+                time.sleep(1)
             
     except KeyboardInterrupt:
         manager.stop_all()
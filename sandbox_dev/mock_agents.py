@@ -6,12 +6,15 @@ Mock Agents Service for development testing
 
 import uvicorn
 from fastapi import FastAPI
-from pydantic import BaseModel
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, ConfigDict
 from typing import Optional, Dict, Any
 
-app = FastAPI(title="Mock Agents Service", version="1.0.0")
+app = FastAPI(title="Mock Agents Service", version="1.0.0", default_response_class=ORJSONResponse)
 
 class AgentRequest(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    
     task: str
     agent_type: str = "general"
     context: Optional[Dict[str, Any]] = None
@@ -46,4 +49,4 @@ async def list_agents():
     }
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8002)
+    uvicorn.run(app, host="0.0.0.0", port=8002, access_log=False)
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+All mock services in a single process for development testing
+
+Запуск: python sandbox_dev/mock_all.py [rag] [agents] [ollama] [qdrant]
+Без аргументов поднимает все моки. FastAPI, Pydantic и uvicorn импортируются
+один раз, а каждый мок слушает свой обычный порт.
+"""
+
+import asyncio
+import sys
+
+import uvicorn
+
+import mock_agents
+import mock_ollama
+import mock_qdrant
+import mock_rag
+
+MOCKS = {
+    "rag": (mock_rag.app, 8001),
+    "agents": (mock_agents.app, 8002),
+    "ollama": (mock_ollama.app, 11434),
+    "qdrant": (mock_qdrant.app, 6333),
+}
+
+async def serve(names):
+    servers = [
+        uvicorn.Server(uvicorn.Config(MOCKS[name][0], host="0.0.0.0", port=MOCKS[name][1], access_log=False))
+        for name in names
+    ]
+    tasks = [asyncio.create_task(server.serve()) for server in servers]
+
+    # Остановка одного сервера (сигнал или ошибка запуска) останавливает все
+    await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    for server in servers:
+        server.should_exit = True
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(MOCKS)
+    unknown = [name for name in names if name not in MOCKS]
+    if unknown:
+        sys.exit(f"Unknown mocks: {', '.join(unknown)}; available: {', '.join(MOCKS)}")
+
+    asyncio.run(serve(names))
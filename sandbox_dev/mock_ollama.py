@@ -6,12 +6,16 @@ Mock Ollama Service for development testing
 
 import uvicorn
 from fastapi import FastAPI
-from pydantic import BaseModel
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, ConfigDict
 from typing import Optional, List, Dict, Any
+import orjson
 
-app = FastAPI(title="Mock Ollama Service", version="1.0.0")
+app = FastAPI(title="Mock Ollama Service", version="1.0.0", default_response_class=ORJSONResponse)
 
 class ChatRequest(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    
     model: str
     messages: List[Dict[str, str]]
     stream: Optional[bool] = False
@@ -30,6 +34,26 @@ async def list_models():
 async def chat(request: ChatRequest):
     last_message = request.messages[-1]["content"] if request.messages else ""
     
+    if request.stream:
+        # Ollama stream: по одному NDJSON-чанку на токен и финальный done
+        async def generate():
+            content = f"Mock LLM response using {request.model}: {last_message[:100]}..."
+            for token in content.split():
+                yield orjson.dumps({
+                    "model": request.model,
+                    "created_at": "2025-08-01T13:00:00Z",
+                    "message": {"role": "assistant", "content": token + " "},
+                    "done": False
+                }) + b"\n"
+            yield orjson.dumps({
+                "model": request.model,
+                "created_at": "2025-08-01T13:00:00Z",
+                "message": {"role": "assistant", "content": ""},
+                "done": True
+            }) + b"\n"
+        
+        return StreamingResponse(generate(), media_type="application/x-ndjson")
+    
     return {
         "model": request.model,
         "created_at": "2025-08-01T13:00:00Z",
@@ -45,4 +69,4 @@ async def version():
     return {"version": "0.1.0-mock"}
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=11434)
+    uvicorn.run(app, host="0.0.0.0", port=11434, access_log=False)
@@ -5,27 +5,109 @@ Mock Qdrant Service for development testing
 """
 
 import uvicorn
-from fastapi import FastAPI
-from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Optional, List, Dict, Any, Union
 import uuid
 import numpy as np
 
-app = FastAPI(title="Mock Qdrant Service", version="1.0.0")
+app = FastAPI(title="Mock Qdrant Service", version="1.0.0", default_response_class=ORJSONResponse)
 
 # Простое хранилище для мока
 collections = {}
 points = {}
 
+# Векторы каждой коллекции хранятся одной float32-матрицей (строка на точку)
+# с заранее посчитанными нормами, чтобы поиск был одним матрично-векторным умножением.
+# id точек хранятся как пришли (int или str), как и в настоящем Qdrant
+point_ids: Dict[str, List[Union[int, str]]] = {}
+point_rows: Dict[str, Dict[Union[int, str], int]] = {}
+point_matrix: Dict[str, np.ndarray] = {}
+point_norms: Dict[str, np.ndarray] = {}
+
+# Ответ поиска по пустой коллекции
+MOCK_SEARCH_RESULTS = [
+    {
+        "id": "mock_point_1",
+        "version": 1,
+        "score": 0.95,
+        "payload": {"text": "Mock search result 1", "source": "mock_doc.pdf"}
+    },
+    {
+        "id": "mock_point_2", 
+        "version": 1,
+        "score": 0.87,
+        "payload": {"text": "Mock search result 2", "source": "mock_doc2.pdf"}
+    }
+]
+
+def reset_vectors(collection_name: str):
+    point_ids[collection_name] = []
+    point_rows[collection_name] = {}
+    point_matrix[collection_name] = np.empty((0, 0), dtype=np.float32)
+    point_norms[collection_name] = np.empty(0, dtype=np.float32)
+
+def store_vectors(collection_name: str, new_points: Dict[Union[int, str], List[float]]):
+    """Запись векторов в матрицу коллекции: обновление строк на месте, новые строки одним vstack.
+    
+    Все векторы проверяются до изменения матрицы, поэтому при ValueError коллекция не меняется
+    """
+    if collection_name not in point_matrix:
+        reset_vectors(collection_name)
+    
+    ids = point_ids[collection_name]
+    rows = point_rows[collection_name]
+    matrix = point_matrix[collection_name]
+    
+    # Векторы разной длины numpy не соберёт в матрицу и сам выбросит ValueError
+    vectors = np.asarray(list(new_points.values()), dtype=np.float32)
+    if vectors.ndim != 2:
+        raise ValueError("vectors must be flat lists of numbers")
+    if matrix.size and vectors.shape[1] != matrix.shape[1]:
+        raise ValueError(f"expected dim: {matrix.shape[1]}, got {vectors.shape[1]}")
+    
+    positions = {point_id: i for i, point_id in enumerate(new_points)}
+    appended_ids = [point_id for point_id in new_points if point_id not in rows]
+    if appended_ids:
+        new_rows = vectors[[positions[point_id] for point_id in appended_ids]]
+        matrix = new_rows if matrix.size == 0 else np.vstack([matrix, new_rows])
+        for point_id in appended_ids:
+            rows[point_id] = len(ids)
+            ids.append(point_id)
+    
+    appended = set(appended_ids)
+    for point_id, i in positions.items():
+        if point_id not in appended:
+            matrix[rows[point_id]] = vectors[i]
+    
+    point_matrix[collection_name] = matrix
+    point_norms[collection_name] = np.linalg.norm(matrix, axis=1)
+
 class Collection(BaseModel):
     name: str
     vectors: Dict[str, Any]
 
 class Point(BaseModel):
-    id: str
-    vector: List[float]
+    model_config = ConfigDict(extra="ignore")
+    
+    id: Union[int, str] = Field(default_factory=lambda: str(uuid.uuid4()))
+    vector: Union[List[float], Dict[str, List[float]], None] = None
     payload: Optional[Dict[str, Any]] = None
 
+class UpsertRequest(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    
+    points: List[Point] = []
+
+class SearchRequest(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    
+    vector: List[float]
+    limit: int = 10
+    score_threshold: Optional[float] = None
+    with_payload: Union[bool, List[str]] = True
+
 @app.get("/health")
 async def health():
     return {"status": "green", "version": "1.0.0-mock"}
@@ -38,38 +120,70 @@ async def list_collections():
 async def create_collection(collection_name: str, collection: Dict[str, Any]):
     collections[collection_name] = collection
     points[collection_name] = {}
+    reset_vectors(collection_name)
     return {"result": True, "status": "ok"}
 
 @app.post("/collections/{collection_name}/points")
-async def upsert_points(collection_name: str, request: Dict[str, Any]):
+async def upsert_points(collection_name: str, request: UpsertRequest):
     if collection_name not in points:
         points[collection_name] = {}
     
-    for point in request.get("points", []):
-        point_id = str(point.get("id", str(uuid.uuid4())))
-        points[collection_name][point_id] = point
+    new_vectors = {
+        point.id: point.vector
+        for point in request.points
+        if isinstance(point.vector, list)
+    }
+    
+    # Сначала векторы: отклонённый запрос не должен менять ни матрицу, ни точки
+    if new_vectors:
+        try:
+            store_vectors(collection_name, new_vectors)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Wrong vector dimension: {e}")
+    
+    for point in request.points:
+        points[collection_name][point.id] = point
     
     return {"result": {"operation_id": 0, "status": "completed"}}
 
 @app.post("/collections/{collection_name}/points/search")
-async def search_points(collection_name: str, request: Dict[str, Any]):
-    # Мок поиска - возвращаем случайные результаты
-    return {
-        "result": [
-            {
-                "id": "mock_point_1",
-                "version": 1,
-                "score": 0.95,
-                "payload": {"text": "Mock search result 1", "source": "mock_doc.pdf"}
-            },
-            {
-                "id": "mock_point_2", 
-                "version": 1,
-                "score": 0.87,
-                "payload": {"text": "Mock search result 2", "source": "mock_doc2.pdf"}
-            }
-        ]
-    }
+async def search_points(collection_name: str, request: SearchRequest):
+    matrix = point_matrix.get(collection_name)
+    if matrix is None or matrix.size == 0:
+        # Пустая коллекция - возвращаем фиксированные результаты
+        return {"result": MOCK_SEARCH_RESULTS}
+    
+    query = np.asarray(request.vector, dtype=np.float32)
+    if query.shape != (matrix.shape[1],):
+        raise HTTPException(status_code=400, detail=f"Expected vector of dimension {matrix.shape[1]}")
+    
+    # Косинусное сходство со всеми точками за одно умножение
+    denominator = point_norms[collection_name] * np.linalg.norm(query)
+    scores = np.divide(matrix @ query, denominator, out=np.zeros(len(matrix), dtype=np.float32), where=denominator > 0)
+    
+    limit = min(request.limit, len(scores))
+    if limit <= 0:
+        return {"result": []}
+    top = np.argpartition(-scores, limit - 1)[:limit]
+    top = top[np.argsort(-scores[top])]
+    
+    threshold = request.score_threshold
+    with_payload = bool(request.with_payload)
+    ids = point_ids[collection_name]
+    result = []
+    for row in top:
+        score = float(scores[row])
+        if threshold is not None and score < threshold:
+            break
+        point_id = ids[row]
+        result.append({
+            "id": point_id,
+            "version": 1,
+            "score": score,
+            "payload": points[collection_name][point_id].payload if with_payload else None
+        })
+    
+    return {"result": result}
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=6333)
+    uvicorn.run(app, host="0.0.0.0", port=6333, access_log=False)
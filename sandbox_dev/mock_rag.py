@@ -5,10 +5,11 @@ Mock RAG Service for development testing
 
 import uvicorn
 from fastapi import FastAPI
-from pydantic import BaseModel
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, ConfigDict
 from typing import Optional, List
 
-app = FastAPI(title="Mock RAG Service", version="1.0.0")
+app = FastAPI(title="Mock RAG Service", version="1.0.0", default_response_class=ORJSONResponse)
 
 # Mock configuration
 config = {
@@ -20,10 +21,14 @@ config = {
 }
 
 class QueryRequest(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    
     query: str
     session_id: Optional[str] = None
 
 class DocumentUpload(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    
     filename: str
     content: str
     content_type: str
@@ -59,4 +64,4 @@ async def list_documents():
     }
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8001, access_log=False)
\ No newline at end of file
@@ -10,6 +10,10 @@ import json
 import time
 from typing import Dict, Any
 
+# Лимит на одну проверку здоровья и на всю фазу проверок, секунды
+HEALTH_CHECK_TIMEOUT = 1.0
+HEALTH_PHASE_TIMEOUT = 1.5
+
 class ServiceTester:
     def __init__(self):
         self.base_urls = {
@@ -21,20 +25,17 @@ class ServiceTester:
         }
         
     async def test_service_health(self, session: aiohttp.ClientSession, service: str, url: str):
-        """Тест здоровья сервиса"""
+        """Тест здоровья сервиса: только код ответа, тело не читается"""
         try:
             health_endpoint = f"{url}/health" if service != "ollama" else f"{url}/api/version"
-            async with session.get(health_endpoint) as response:
+            async with session.get(health_endpoint, timeout=aiohttp.ClientTimeout(total=HEALTH_CHECK_TIMEOUT)) as response:
                 if response.status == 200:
-                    data = await response.json()
-                    print(f"✅ {service}: {data}")
-                    return True
-                else:
-                    print(f"❌ {service}: HTTP {response.status}")
-                    return False
+                    return service, True, "OK"
+                return service, False, f"HTTP {response.status}"
+        except asyncio.TimeoutError:
+            return service, False, f"нет ответа за {HEALTH_CHECK_TIMEOUT} с"
         except Exception as e:
-            print(f"❌ {service}: {e}")
-            return False
+            return service, False, str(e)
     
     async def test_gateway_demo(self, session: aiohttp.ClientSession):
         """Тест demo chat через gateway"""
@@ -125,34 +126,52 @@ class ServiceTester:
         """Запуск всех тестов"""
         print("🧪 Запускаю тесты взаимодействия сервисов AI Box...\n")
         
-        async with aiohttp.ClientSession() as session:
+        # Ограниченный пул с keep-alive: одно соединение на сервис переиспользуется всеми проверками
+        connector = aiohttp.TCPConnector(
+            limit=32,
+            limit_per_host=8,
+            keepalive_timeout=30,
+            ttl_dns_cache=300
+        )
+        timeout = aiohttp.ClientTimeout(total=10)
+        
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
             # Тесты здоровья всех сервисов
             print("📋 Проверка здоровья сервисов:")
-            health_results = []
-            for service, url in self.base_urls.items():
-                result = await self.test_service_health(session, service, url)
-                health_results.append(result)
-                await asyncio.sleep(0.5)
+            # Проверки независимы, поэтому выполняются одновременно; общая фаза
+            # ограничена по времени, зависшие проверки отменяются и считаются неуспешными
+            tasks = {
+                service: asyncio.create_task(self.test_service_health(session, service, url))
+                for service, url in self.base_urls.items()
+            }
+            _, pending = await asyncio.wait(tasks.values(), timeout=HEALTH_PHASE_TIMEOUT)
+            for task in pending:
+                task.cancel()
+            health_results = [
+                (service, False, f"проверка прервана через {HEALTH_PHASE_TIMEOUT} с") if task in pending else task.result()
+                for service, task in tasks.items()
+            ]
+            healthy = sum(ok for _, ok, _ in health_results)
             
-            print(f"\n📊 Здоровых сервисов: {sum(health_results)}/{len(health_results)}")
+            # Итог выводится одним блоком после завершения всех проверок
+            lines = [f"{'✅' if ok else '❌'} {service}: {detail}" for service, ok, detail in health_results]
+            lines.append(f"\n📊 Здоровых сервисов: {healthy}/{len(health_results)}")
+            print("\n".join(lines))
             
-            if sum(health_results) == 0:
+            if healthy == 0:
                 print("❌ Нет доступных сервисов. Запустите dev_environment.py")
                 return
             
             print("\n🔄 Тестирование взаимодействия:")
             
             # Функциональные тесты
-            await self.test_gateway_demo(session)
-            await asyncio.sleep(1)
-            
-            await self.test_rag_query(session)
-            await asyncio.sleep(1)
-            
-            await self.test_agents_execute(session)
-            await asyncio.sleep(1)
-            
-            await self.test_ollama_chat(session)
+            await asyncio.gather(
+                self.test_gateway_demo(session),
+                self.test_rag_query(session),
+                self.test_agents_execute(session),
+                self.test_ollama_chat(session),
+                return_exceptions=True
+            )
             
         print("\n✅ Тестирование завершено!")
 
@@ -107,7 +107,7 @@ $(docker ps --format "table {{.Names}}\t{{.Status}}" | grep aibox || echo "No AI
 System Info:
 OS: $(lsb_release -d -s 2>/dev/null || uname -s)
 Kernel: $(uname -r)
-Memory: $(free -h | grep Mem: | awk '{print $2}')
+Memory: $(awk '/^MemTotal:/ {printf "%.1fGi", $2 / 1048576}' /proc/meminfo 2>/dev/null || echo "Unknown")
 Disk Space: $(df -h / | tail -1 | awk '{print $4}' 2>/dev/null || echo "Unknown")
 
 Backup Contents:
@@ -2,47 +2,241 @@
 Document Agent - LangChain agent for document-related tasks
 """
 
+import asyncio
+import hashlib
 import logging
 import os
-from typing import List, Dict, Any, Optional
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import List, Dict, Any, Optional, Tuple, Deque, AsyncIterator
+from uuid import UUID
 from datetime import datetime
 
 from langchain.agents import AgentExecutor, create_tool_calling_agent
-from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
-from langchain_core.tools import BaseTool, tool
+from langchain_core.agents import AgentAction, AgentFinish
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage
+from langchain_core.tools import tool
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.callbacks.base import BaseCallbackHandler
 from langchain_ollama import ChatOllama
 from pydantic import BaseModel, Field
-import requests
-import json
+from prometheus_client import Counter, Histogram
+from redis import asyncio as aioredis
+import httpx
+import orjson
 
 logger = logging.getLogger(__name__)
 
+# Step-by-step executor tracing is for development only
+AGENT_VERBOSE = os.getenv("ENVIRONMENT", "development") != "production"
+
+# Share of tool start/end events written to the log; errors are always logged
+AGENT_LOG_SAMPLE = float(os.getenv("AGENT_LOG_SAMPLE", "0.1"))
+
+# Tool-calling rounds before the executor stops and returns what it has
+AGENT_MAX_ITER = int(os.getenv("AGENT_MAX_ITER", "3"))
+
+# Number of past exchanges kept in each session's conversation memory
+MEMORY_WINDOW = 10
+
+# Sessions whose memory is kept; the least recently used one is dropped beyond this
+MEMORY_MAX_SESSIONS = int(os.getenv("AGENT_MEMORY_MAX_SESSIONS", "1000"))
+
+agent_tool_calls = Histogram(
+    "agents_document_agent_tool_calls",
+    "Tool calls made by the document agent per message",
+    buckets=(0, 1, 2, 3, 5, 8)
+)
+
+# Passed through to the httpx client inside ChatOllama so LLM turns reuse
+# keep-alive connections to Ollama from a bounded pool
+OLLAMA_CLIENT_KWARGS = {
+    "limits": httpx.Limits(max_keepalive_connections=20, max_connections=50, keepalive_expiry=60.0),
+    "timeout": 60.0,
+}
+
 class DocumentAgentCallbackHandler(BaseCallbackHandler):
     """Custom callback handler for document agent"""
     
+    def __init__(self):
+        # Tool calls made so far by each running executor call
+        self._tool_calls: Dict[UUID, int] = {}
+    
     def on_tool_start(self, serialized: Dict[str, Any], input_str: str, **kwargs) -> None:
-        logger.info(f"Tool {serialized.get('name', 'unknown')} started with input: {input_str}")
+        if random.random() < AGENT_LOG_SAMPLE:
+            logger.info("Tool %s started with input length: %d", serialized.get('name', 'unknown'), len(input_str))
     
     def on_tool_end(self, output: str, **kwargs) -> None:
-        logger.info(f"Tool completed with output length: {len(output) if output else 0}")
+        if random.random() < AGENT_LOG_SAMPLE:
+            logger.info("Tool completed with output length: %d", len(output) if output else 0)
     
     def on_tool_error(self, error: Exception, **kwargs) -> None:
         logger.error(f"Tool error: {error}")
+    
+    def on_agent_action(self, action: AgentAction, *, run_id: UUID, **kwargs) -> None:
+        self._tool_calls[run_id] = self._tool_calls.get(run_id, 0) + 1
+    
+    def on_agent_finish(self, finish: AgentFinish, *, run_id: UUID, **kwargs) -> None:
+        agent_tool_calls.observe(self._tool_calls.pop(run_id, 0))
+    
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs) -> None:
+        self._tool_calls.pop(run_id, None)
 
 class DocumentSearchInput(BaseModel):
     """Input schema for document search tool"""
     query: str = Field(description="The search query for documents")
     top_k: int = Field(default=5, description="Number of top results to return")
 
+class MultiAnalysisInput(BaseModel):
+    """Input schema for multi-type document analysis tool"""
+    query: str = Field(description="The query or document reference")
+    analysis_types: List[str] = Field(description="Types of analysis to run (general, technical, summary, keywords, entities)")
+
 class DocumentUploadInput(BaseModel):
     """Input schema for document upload tool"""
     file_path: str = Field(description="Path to the file to upload")
     filename: str = Field(description="Name of the file")
 
+# Shared client for the RAG service so tool calls reuse connections; the pool
+# size caps how many tool calls of one agent turn hit the RAG service at once
+RAG_MAX_CONCURRENCY = int(os.getenv("RAG_MAX_CONCURRENCY", "5"))
+_rag_client: Optional[httpx.AsyncClient] = None
+
+def get_rag_client() -> httpx.AsyncClient:
+    """Get or create the shared RAG service client"""
+    global _rag_client
+    if _rag_client is None:
+        _rag_client = httpx.AsyncClient(
+            base_url=os.getenv("RAG_API_BASE", "http://rag:8001"),
+            transport=httpx.AsyncHTTPTransport(
+                limits=httpx.Limits(max_connections=RAG_MAX_CONCURRENCY, max_keepalive_connections=RAG_MAX_CONCURRENCY),
+                retries=2
+            ),
+            headers={"content-type": "application/json", "accept": "application/json"},
+            timeout=30.0
+        )
+    return _rag_client
+
+def _error_body(response: httpx.Response) -> str:
+    """Start of an error response body, enough to identify the failure"""
+    return response.content[:512].decode("utf-8", errors="replace")
+
+async def close_rag_client():
+    """Close the shared RAG service client and the Redis cache connection"""
+    global _rag_client, _redis
+    if _rag_client is not None:
+        await _rag_client.aclose()
+        _rag_client = None
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
+
+# Recent RAG answers keyed by normalized query and top_k, kept in LRU order
+RAG_CACHE_TTL = float(os.getenv("RAG_CACHE_TTL", "300"))
+RAG_CACHE_SIZE = int(os.getenv("RAG_CACHE_SIZE", "256"))
+_rag_cache: "OrderedDict[Tuple[str, int], Tuple[float, str]]" = OrderedDict()
+
+# Optional second cache level shared by all agents replicas
+REDIS_URL = os.getenv("REDIS_URL")
+_redis: Optional[aioredis.Redis] = None
+_redis_error_logged = False
+
+rag_cache_hits = Counter("agents_rag_cache_hits_total", "RAG query results served from cache", ["level"])
+rag_cache_misses = Counter("agents_rag_cache_misses_total", "RAG queries sent to the RAG service")
+
+def get_redis() -> Optional[aioredis.Redis]:
+    """Get or create the Redis cache client, or None when REDIS_URL is not set"""
+    global _redis
+    if _redis is None and REDIS_URL:
+        _redis = aioredis.Redis.from_url(REDIS_URL, socket_connect_timeout=0.5, socket_timeout=0.5)
+    return _redis
+
+def _redis_unavailable(error: Exception):
+    """Log the first Redis failure; the local cache keeps working without it"""
+    global _redis_error_logged
+    if not _redis_error_logged:
+        logger.warning(f"Redis RAG cache unavailable, using the local cache only: {error}")
+        _redis_error_logged = True
+
+# Lookups currently in progress, keyed like the local cache
+_rag_inflight: Dict[Tuple[str, int], "asyncio.Future[str]"] = {}
+
+def _remember_rag_result(key: Tuple[str, int], payload: str):
+    """Store a RAG answer in the local cache, evicting the least recently used"""
+    _rag_cache[key] = (time.monotonic(), payload)
+    _rag_cache.move_to_end(key)
+    while len(_rag_cache) > RAG_CACHE_SIZE:
+        _rag_cache.popitem(last=False)
+
+async def _search_rag(query: str, top_k: int) -> str:
+    """Query the RAG service and return the answer with its sources as JSON"""
+    key = (" ".join(query.lower().split()), top_k)
+    entry = _rag_cache.get(key)
+    if entry is not None and time.monotonic() - entry[0] < RAG_CACHE_TTL:
+        _rag_cache.move_to_end(key)
+        rag_cache_hits.labels(level="local").inc()
+        return entry[1]
+    
+    # Concurrent identical queries share one lookup; shield keeps a cancelled
+    # caller from cancelling the request the others are waiting on
+    task = _rag_inflight.get(key)
+    if task is not None:
+        rag_cache_hits.labels(level="inflight").inc()
+    else:
+        task = asyncio.ensure_future(_fetch_rag(query, top_k, key))
+        _rag_inflight[key] = task
+        task.add_done_callback(lambda _: _rag_inflight.pop(key, None))
+    return await asyncio.shield(task)
+
+async def _fetch_rag(query: str, top_k: int, key: Tuple[str, int]) -> str:
+    """Look up a RAG answer in Redis, falling back to the RAG service"""
+    redis = get_redis()
+    redis_key = "agents:rag:" + hashlib.blake2b(f"{top_k}:{key[0]}".encode(), digest_size=16).hexdigest()
+    if redis is not None:
+        try:
+            cached = await redis.get(redis_key)
+        except Exception as e:
+            _redis_unavailable(e)
+            cached = None
+        if cached is not None:
+            payload = cached.decode()
+            _remember_rag_result(key, payload)
+            rag_cache_hits.labels(level="redis").inc()
+            return payload
+    rag_cache_misses.inc()
+    
+    response = await get_rag_client().post(
+        "/query",
+        content=orjson.dumps({
+            "query": query,
+            "top_k": top_k,
+            "similarity_threshold": 0.7
+        })
+    )
+    
+    if response.status_code == 200:
+        result = orjson.loads(response.content)
+        payload = orjson.dumps({
+            "answer": result.get("answer", ""),
+            "sources": result.get("sources", []),
+            "metadata": result.get("metadata", {})
+        }, option=orjson.OPT_INDENT_2).decode()
+        
+        # Only successful answers are cached
+        _remember_rag_result(key, payload)
+        if redis is not None:
+            try:
+                await redis.set(redis_key, payload, ex=max(1, int(RAG_CACHE_TTL)))
+            except Exception as e:
+                _redis_unavailable(e)
+        return payload
+    else:
+        return f"Error searching documents: {response.status_code} - {_error_body(response)}"
+
 @tool("search_documents", args_schema=DocumentSearchInput)
-def search_documents(query: str, top_k: int = 5) -> str:
+async def search_documents(query: str, top_k: int = 5) -> str:
     """
     Search through uploaded documents using RAG service.
     
@@ -54,33 +248,14 @@ def search_documents(query: str, top_k: int = 5) -> str:
         JSON string with search results
     """
     try:
-        rag_api_base = os.getenv("RAG_API_BASE", "http://rag:8001")
-        response = requests.post(
-            f"{rag_api_base}/query",
-            json={
-                "query": query,
-                "top_k": top_k,
-                "similarity_threshold": 0.7
-            },
-            timeout=30
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            return json.dumps({
-                "answer": result.get("answer", ""),
-                "sources": result.get("sources", []),
-                "metadata": result.get("metadata", {})
-            }, indent=2)
-        else:
-            return f"Error searching documents: {response.status_code} - {response.text}"
+        return await _search_rag(query, top_k)
             
     except Exception as e:
         logger.error(f"Error in search_documents: {e}")
         return f"Error searching documents: {str(e)}"
 
 @tool("list_documents")
-def list_documents() -> str:
+async def list_documents() -> str:
     """
     List all uploaded documents.
     
@@ -88,21 +263,22 @@ def list_documents() -> str:
         JSON string with list of documents
     """
     try:
-        rag_api_base = os.getenv("RAG_API_BASE", "http://rag:8001")
-        response = requests.get(f"{rag_api_base}/documents", timeout=30)
+        response = await get_rag_client().get("/documents")
         
         if response.status_code == 200:
-            documents = response.json()
-            return json.dumps(documents, indent=2)
+            return orjson.dumps(orjson.loads(response.content), option=orjson.OPT_INDENT_2).decode()
         else:
-            return f"Error listing documents: {response.status_code} - {response.text}"
+            return f"Error listing documents: {response.status_code} - {_error_body(response)}"
             
     except Exception as e:
         logger.error(f"Error in list_documents: {e}")
         return f"Error listing documents: {str(e)}"
 
+# Characters of retrieved content passed to the LLM for a summary
+SUMMARY_CONTENT_LIMIT = 2000
+
 @tool("get_document_summary")
-def get_document_summary(filename: str) -> str:
+async def get_document_summary(filename: str) -> str:
     """
     Get a summary of a specific document.
     
@@ -115,21 +291,31 @@ def get_document_summary(filename: str) -> str:
     try:
         # First search for content related to the filename
         query = f"document:{filename} OR filename:{filename}"
-        result = search_documents(query, top_k=3)
+        result = await _search_rag(query, top_k=3)
         
-        if result and "Error" not in result:
-            data = json.loads(result)
+        if result and not result.startswith("Error"):
+            data = orjson.loads(result)
             sources = data.get("sources", [])
             
             if sources:
-                # Combine content from sources
-                content = "\n\n".join([source.get("content", "") for source in sources])
+                # Combine content from sources, stopping once the prompt budget is used
+                parts, total = [], 0
+                for source in sources:
+                    part = source.get("content", "")[:SUMMARY_CONTENT_LIMIT - total]
+                    parts.append(part)
+                    total += len(part)
+                    if total >= SUMMARY_CONTENT_LIMIT:
+                        break
+                content = "\n\n".join(parts)
                 
-                # Request summary from LLM
-                summary_query = f"Please provide a concise summary of this document content:\n\n{content[:2000]}"
-                summary_result = search_documents(summary_query, top_k=1)
+                # Summarize the retrieved content with the agent's LLM; the RAG
+                # service only retrieves and answers questions over the index
+                summary = await get_document_agent().llm.ainvoke([
+                    SystemMessage(content="Provide a concise summary of this document content."),
+                    HumanMessage(content=content)
+                ])
                 
-                return summary_result
+                return summary.content
             else:
                 return f"No content found for document: {filename}"
         else:
@@ -139,8 +325,17 @@ def get_document_summary(filename: str) -> str:
         logger.error(f"Error in get_document_summary: {e}")
         return f"Error getting document summary: {str(e)}"
 
+# Map analysis types to specific prompts
+ANALYSIS_PROMPTS = {
+    "general": "Provide a general analysis of this content:",
+    "technical": "Provide a technical analysis focusing on implementation details:",
+    "summary": "Provide a concise summary of the main points:",
+    "keywords": "Extract the key terms and concepts from this content:",
+    "entities": "Identify important entities, names, and organizations:"
+}
+
 @tool("analyze_document_content")
-def analyze_document_content(query: str, analysis_type: str = "general") -> str:
+async def analyze_document_content(query: str, analysis_type: str = "general") -> str:
     """
     Perform specific analysis on document content.
     
@@ -152,25 +347,78 @@ def analyze_document_content(query: str, analysis_type: str = "general") -> str:
         Analysis results
     """
     try:
-        # Map analysis types to specific prompts
-        analysis_prompts = {
-            "general": "Provide a general analysis of this content:",
-            "technical": "Provide a technical analysis focusing on implementation details:",
-            "summary": "Provide a concise summary of the main points:",
-            "keywords": "Extract the key terms and concepts from this content:",
-            "entities": "Identify important entities, names, and organizations:"
-        }
-        
-        prompt = analysis_prompts.get(analysis_type, analysis_prompts["general"])
+        prompt = ANALYSIS_PROMPTS.get(analysis_type, ANALYSIS_PROMPTS["general"])
         full_query = f"{prompt} {query}"
         
-        result = search_documents(full_query, top_k=5)
+        result = await _search_rag(full_query, top_k=5)
         return result
         
     except Exception as e:
         logger.error(f"Error in analyze_document_content: {e}")
         return f"Error analyzing document content: {str(e)}"
 
+@tool("analyze_document_multi", args_schema=MultiAnalysisInput)
+async def analyze_document_multi(query: str, analysis_types: List[str]) -> str:
+    """
+    Run several types of analysis on document content at once.
+    
+    Args:
+        query: The query or document reference
+        analysis_types: Types of analysis (general, technical, summary, keywords, entities)
+        
+    Returns:
+        JSON object with the result of each analysis type
+    """
+    try:
+        # The searches are independent; the RAG client pool bounds how many run at once
+        analysis_types = list(dict.fromkeys(analysis_types)) or ["general"]
+        results = await asyncio.gather(*(
+            _search_rag(f"{ANALYSIS_PROMPTS.get(analysis_type, ANALYSIS_PROMPTS['general'])} {query}", top_k=5)
+            for analysis_type in analysis_types
+        ), return_exceptions=True)
+        
+        analyses = {}
+        for analysis_type, result in zip(analysis_types, results):
+            if isinstance(result, Exception):
+                analyses[analysis_type] = f"Error analyzing document content: {result}"
+            elif result.startswith("Error"):
+                analyses[analysis_type] = result
+            else:
+                analyses[analysis_type] = orjson.loads(result)
+        return orjson.dumps(analyses, option=orjson.OPT_INDENT_2).decode()
+        
+    except Exception as e:
+        logger.error(f"Error in analyze_document_multi: {e}")
+        return f"Error analyzing document content: {str(e)}"
+
+HISTORY_MESSAGE_TYPES = {HumanMessage: "human", AIMessage: "ai"}
+
+SYSTEM_PROMPT = """You are a specialized document analysis assistant with access to a document search and retrieval system.
+
+Your capabilities include:
+1. Searching through uploaded documents using semantic search
+2. Listing available documents
+3. Providing summaries of specific documents
+4. Performing various types of content analysis
+
+When handling document-related requests:
+- Use search_documents for finding relevant information across all documents
+- Use list_documents to see what documents are available
+- Use get_document_summary for document overviews
+- Use analyze_document_content for specific analysis tasks
+- Use analyze_document_multi when several types of analysis are needed for the same content
+
+Always provide clear, concise, and helpful responses. If you cannot find relevant information, explain what you searched for and suggest alternative approaches.
+
+For complex queries, break them down into smaller searches and combine the results thoughtfully."""
+
+PROMPT_TEMPLATE = ChatPromptTemplate.from_messages([
+    ("system", SYSTEM_PROMPT),
+    MessagesPlaceholder(variable_name="chat_history"),
+    ("human", "{input}"),
+    MessagesPlaceholder(variable_name="agent_scratchpad")
+])
+
 class DocumentAgent:
     """LangChain agent specialized for document operations"""
     
@@ -178,26 +426,24 @@ class DocumentAgent:
         self.llm = ChatOllama(
             model=os.getenv("OLLAMA_MODEL", "llama3.2:3b"),
             base_url=os.getenv("OLLAMA_API_BASE", "http://ollama:11434"),
-            temperature=0.1
+            temperature=0.1,
+            client_kwargs=OLLAMA_CLIENT_KWARGS
         )
         
         self.tools = [
             search_documents,
             list_documents,
             get_document_summary,
-            analyze_document_content
+            analyze_document_content,
+            analyze_document_multi
         ]
         
         self.callback_handler = DocumentAgentCallbackHandler()
-        self.chat_history = []  # Simple list to store conversation history
+        # Conversation memory per session; the LLM client and agent graph are shared
+        self._memories: "OrderedDict[str, Deque[BaseMessage]]" = OrderedDict()
         
-        # Create prompt template
-        self.prompt = ChatPromptTemplate.from_messages([
-            ("system", self._get_system_prompt()),
-            MessagesPlaceholder(variable_name="chat_history"),
-            ("human", "{input}"),
-            MessagesPlaceholder(variable_name="agent_scratchpad")
-        ])
+        # Prompt template is immutable and shared
+        self.prompt = PROMPT_TEMPLATE
         
         # Create agent
         self.agent = create_tool_calling_agent(
@@ -211,31 +457,11 @@ class DocumentAgent:
             agent=self.agent,
             tools=self.tools,
             callbacks=[self.callback_handler],
-            verbose=True,
-            max_iterations=5,
-            early_stopping_method="generate"
+            verbose=AGENT_VERBOSE,
+            max_iterations=AGENT_MAX_ITER,
+            early_stopping_method="force"
         )
     
-    def _get_system_prompt(self) -> str:
-        """Get the system prompt for the document agent"""
-        return """You are a specialized document analysis assistant with access to a document search and retrieval system.
-
-Your capabilities include:
-1. Searching through uploaded documents using semantic search
-2. Listing available documents
-3. Providing summaries of specific documents
-4. Performing various types of content analysis
-
-When handling document-related requests:
-- Use search_documents for finding relevant information across all documents
-- Use list_documents to see what documents are available
-- Use get_document_summary for document overviews
-- Use analyze_document_content for specific analysis tasks
-
-Always provide clear, concise, and helpful responses. If you cannot find relevant information, explain what you searched for and suggest alternative approaches.
-
-For complex queries, break them down into smaller searches and combine the results thoughtfully."""
-    
     async def process_message(self, message: str, session_id: str = None) -> Dict[str, Any]:
         """
         Process a message through the document agent
@@ -248,27 +474,23 @@ For complex queries, break them down into smaller searches and combine the resul
             Response dictionary with answer and metadata
         """
         try:
-            start_time = datetime.now()
+            start_time = time.perf_counter()
             
             # Add user message to chat history
-            self.chat_history.append(HumanMessage(content=message))
+            chat_history = self._get_memory(session_id)
+            chat_history.append(HumanMessage(content=message))
             
             # Execute agent
             result = await self.agent_executor.ainvoke({
                 "input": message,
-                "chat_history": self.chat_history
+                "chat_history": list(chat_history)
             })
             
             # Add AI response to chat history
             answer = result.get("output", "")
-            self.chat_history.append(AIMessage(content=answer))
-            
-            # Keep only last 20 messages (10 exchanges)
-            if len(self.chat_history) > 20:
-                self.chat_history = self.chat_history[-20:]
+            chat_history.append(AIMessage(content=answer))
             
-            end_time = datetime.now()
-            processing_time = (end_time - start_time).total_seconds()
+            processing_time = time.perf_counter() - start_time
             
             return {
                 "answer": answer,
@@ -277,7 +499,7 @@ For complex queries, break them down into smaller searches and combine the resul
                 "processing_time": processing_time,
                 "metadata": {
                     "tools_used": self._extract_tools_used(result),
-                    "timestamp": end_time.isoformat(),
+                    "timestamp": datetime.now().isoformat(),
                     "message_length": len(message)
                 }
             }
@@ -295,6 +517,85 @@ For complex queries, break them down into smaller searches and combine the resul
                 }
             }
     
+    async def stream_message(self, message: str, session_id: str = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Process a message through the document agent, streaming the answer
+        
+        Args:
+            message: User message
+            session_id: Optional session identifier
+            
+        Yields:
+            Token events as the LLM generates text, then one done or error event
+        """
+        try:
+            start_time = time.perf_counter()
+            
+            # Add user message to chat history
+            chat_history = self._get_memory(session_id)
+            chat_history.append(HumanMessage(content=message))
+            
+            tokens = []
+            answer = None
+            tool_runs = set()
+            planning_runs = set()
+            async for event in self.agent_executor.astream_events({
+                "input": message,
+                "chat_history": list(chat_history)
+            }, version="v2"):
+                if event["event"] == "on_tool_start":
+                    tool_runs.add(event["run_id"])
+                elif event["event"] == "on_chat_model_stream":
+                    # Only the agent's answer is streamed: turns that plan tool calls
+                    # and LLM calls made inside tools are skipped
+                    run_id = event["run_id"]
+                    chunk = event["data"]["chunk"]
+                    if run_id in planning_runs or tool_runs.intersection(event.get("parent_ids", ())):
+                        continue
+                    if getattr(chunk, "tool_call_chunks", None):
+                        planning_runs.add(run_id)
+                        continue
+                    if chunk.content:
+                        tokens.append(chunk.content)
+                        yield {"type": "token", "content": chunk.content}
+                elif event["event"] == "on_chain_end" and not event.get("parent_ids"):
+                    # End of the executor run itself
+                    answer = event["data"]["output"].get("output")
+            
+            # Add AI response to chat history
+            if answer is None:
+                answer = "".join(tokens)
+            chat_history.append(AIMessage(content=answer))
+            
+            yield {
+                "type": "done",
+                "answer": answer,
+                "agent_type": "document",
+                "session_id": session_id,
+                "processing_time": time.perf_counter() - start_time,
+                "metadata": {
+                    "timestamp": datetime.now().isoformat(),
+                    "message_length": len(message)
+                }
+            }
+            
+        except Exception as e:
+            logger.error(f"Error streaming message in document agent: {e}")
+            yield {
+                "type": "error",
+                "error": str(e),
+                "agent_type": "document",
+                "session_id": session_id
+            }
+    
+    async def warm_up(self):
+        """Load the model and open the Ollama connection before the first request"""
+        try:
+            await self.llm.ainvoke("ping")
+            logger.info("Document agent LLM warmed up")
+        except Exception as e:
+            logger.warning(f"Document agent LLM warm-up failed: {e}")
+    
     def _extract_tools_used(self, result: Dict[str, Any]) -> List[str]:
         """Extract the names of tools used during execution"""
         tools_used = []
@@ -303,31 +604,45 @@ For complex queries, break them down into smaller searches and combine the resul
         # For now, return empty list
         return tools_used
     
+    def _get_memory(self, session_id: str = None) -> Deque[BaseMessage]:
+        """Get or create the conversation memory of a session, bounded to MEMORY_WINDOW exchanges"""
+        key = session_id or "default"
+        memory = self._memories.get(key)
+        if memory is None:
+            memory = deque(maxlen=MEMORY_WINDOW * 2)
+            self._memories[key] = memory
+            if len(self._memories) > MEMORY_MAX_SESSIONS:
+                self._memories.popitem(last=False)
+        else:
+            self._memories.move_to_end(key)
+        return memory
+    
+    def remember_exchange(self, message: str, answer: str, session_id: str = None):
+        """Record an exchange answered outside the agent (e.g. from the response cache)"""
+        memory = self._get_memory(session_id)
+        memory.append(HumanMessage(content=message))
+        memory.append(AIMessage(content=answer))
+    
     def reset_memory(self, session_id: str = None):
-        """Reset the agent's conversation memory"""
-        self.chat_history.clear()
+        """Reset the conversation memory of a session, or of all sessions if none is given"""
+        if session_id is None:
+            self._memories.clear()
+        else:
+            self._memories.pop(session_id, None)
         logger.info(f"Memory reset for document agent (session: {session_id})")
     
     def get_conversation_history(self, session_id: str = None) -> List[Dict[str, Any]]:
         """Get the conversation history"""
         try:
-            history = []
-            
-            for msg in self.chat_history:
-                if isinstance(msg, HumanMessage):
-                    history.append({
-                        "type": "human",
-                        "content": msg.content,
-                        "timestamp": getattr(msg, 'timestamp', None)
-                    })
-                elif isinstance(msg, AIMessage):
-                    history.append({
-                        "type": "ai",
-                        "content": msg.content,
-                        "timestamp": getattr(msg, 'timestamp', None)
-                    })
-            
-            return history
+            return [
+                {
+                    "type": HISTORY_MESSAGE_TYPES[type(msg)],
+                    "content": msg.content,
+                    "timestamp": getattr(msg, 'timestamp', None)
+                }
+                for msg in self._memories.get(session_id or "default", ())
+                if type(msg) in HISTORY_MESSAGE_TYPES
+            ]
             
         except Exception as e:
             logger.error(f"Error getting conversation history: {e}")
@@ -335,12 +650,16 @@ For complex queries, break them down into smaller searches and combine the resul
 
 # Global instance
 document_agent = None
+_document_agent_lock = threading.Lock()
 
 def get_document_agent() -> DocumentAgent:
     """Get or create the global document agent instance"""
     global document_agent
     if document_agent is None:
-        document_agent = DocumentAgent()
+        # Tools may run in worker threads, so construction is guarded
+        with _document_agent_lock:
+            if document_agent is None:
+                document_agent = DocumentAgent()
     return document_agent
 
 async def process_document_query(message: str, session_id: str = None) -> Dict[str, Any]:
@@ -356,3 +675,17 @@ async def process_document_query(message: str, session_id: str = None) -> Dict[s
     """
     agent = get_document_agent()
     return await agent.process_message(message, session_id)
+
+def stream_document_query(message: str, session_id: str = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Process a document-related query, streaming the answer
+    
+    Args:
+        message: User message
+        session_id: Optional session identifier
+        
+    Returns:
+        Async iterator of stream events
+    """
+    agent = get_document_agent()
+    return agent.stream_message(message, session_id)
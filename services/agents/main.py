@@ -19,29 +19,32 @@ POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD", "postgres")
 AI Agents Service - Main FastAPI application
 """
 
+import asyncio
+import hashlib
 import logging
 import os
 import uuid
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Union
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
 
 import uvicorn
-from fastapi import FastAPI, HTTPException, WebSocket, Depends, BackgroundTasks
+from fastapi import FastAPI, HTTPException, WebSocket, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
 from pydantic import BaseModel, Field
-from prometheus_client import generate_latest
-import json
+from prometheus_client import Counter, generate_latest, CONTENT_TYPE_LATEST
+import orjson
 
 # Import agents
-from agents.doc_agent import get_document_agent, process_document_query
-from agents.db_agent import get_database_agent, process_database_query
+from agents.doc_agent import get_document_agent, process_document_query, stream_document_query, close_rag_client, get_redis
+from agents.db_agent import get_database_agent, process_database_query, stream_database_query
 from tools.custom_tools import get_custom_tools, get_tool_by_name
 
 # Database
 import sqlalchemy as sa
-from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 
 # Configure logging
@@ -51,10 +54,30 @@ logger = logging.getLogger(__name__)
 # Database setup
 DATABASE_URL = os.getenv('DATABASE_URL', f'postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}')
 
-engine = sa.create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def get_async_database_url(url: str) -> str:
+    """Map a sync database URL onto its asyncio driver"""
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    return url
+
+# Handlers are async, so the engine runs on an asyncio driver and DB I/O never blocks the loop
+ASYNC_DATABASE_URL = get_async_database_url(DATABASE_URL)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+
+# SQLite (the sandbox database) does not use a sized connection pool
+engine_kwargs = {"pool_pre_ping": True}
+if not ASYNC_DATABASE_URL.startswith("sqlite"):
+    engine_kwargs.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW)
+
+engine = create_async_engine(ASYNC_DATABASE_URL, **engine_kwargs)
+SessionLocal = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False, autoflush=False)
 Base = declarative_base()
 
+PING_QUERY = sa.text("SELECT 1")
+
 # Database models
 class ConversationModel(Base):
     __tablename__ = "agent_conversations"
@@ -67,6 +90,11 @@ class ConversationModel(Base):
     conversation_metadata = sa.Column(sa.JSON)
     created_at = sa.Column(sa.DateTime, default=sa.func.now())
 
+    __table_args__ = (
+        # Serves the per-session history query ordered by created_at
+        sa.Index("ix_agent_conversations_session_created", "session_id", "created_at"),
+    )
+
 class AgentSessionModel(Base):
     __tablename__ = "agent_sessions"
 
@@ -79,6 +107,18 @@ class AgentSessionModel(Base):
     created_at = sa.Column(sa.DateTime, default=sa.func.now())
     updated_at = sa.Column(sa.DateTime, default=sa.func.now(), onupdate=sa.func.now())
 
+# Built once so the compiled form is reused from SQLAlchemy's statement cache
+HISTORY_QUERY = sa.select(
+    ConversationModel.id,
+    ConversationModel.user_message,
+    ConversationModel.agent_response,
+    ConversationModel.agent_type,
+    ConversationModel.conversation_metadata.label("metadata"),
+    ConversationModel.created_at
+).where(
+    ConversationModel.session_id == sa.bindparam("session_id")
+).order_by(ConversationModel.created_at)
+
 # Pydantic models
 class AgentRequest(BaseModel):
     message: str = Field(..., description="User message")
@@ -95,6 +135,18 @@ class AgentResponse(BaseModel):
     metadata: Dict[str, Any]
     timestamp: str
 
+class BatchAgentRequest(BaseModel):
+    messages: List[str] = Field(..., min_length=1, description="User messages to process")
+    agent_type: str = Field(..., description="Type of agent (document, database)")
+    session_ids: Optional[List[Optional[str]]] = Field(default=None, description="Session identifier per message")
+    user_id: Optional[str] = Field(default=None, description="User identifier")
+    max_concurrency: int = Field(default=8, ge=1, le=32, description="Messages processed at the same time")
+    metadata: Optional[Dict[str, Any]] = Field(default_factory=dict, description="Additional metadata")
+
+class BatchAgentResponse(BaseModel):
+    results: List[AgentResponse]
+    total_count: int
+
 class SessionRequest(BaseModel):
     agent_type: str = Field(..., description="Type of agent session to create")
     user_id: Optional[str] = Field(default=None, description="User identifier")
@@ -120,64 +172,256 @@ class ConversationHistoryResponse(BaseModel):
     conversations: List[Dict[str, Any]]
     total_count: int
 
+# Outbound WebSocket messages are queued per session and drained by one writer
+# task. Clients that connect with ?batch=true get whatever is pending coalesced
+# into one {"type": "batch", "items": [...]} frame; others get one frame per message
+WS_QUEUE_SIZE = int(os.getenv("WS_QUEUE_SIZE", "1024"))
+WS_BATCH_SIZE = int(os.getenv("WS_BATCH_SIZE", "128"))
+
 # WebSocket connection manager
 class ConnectionManager:
     def __init__(self):
         self.active_connections: Dict[str, WebSocket] = {}
+        self.queues: Dict[str, "asyncio.Queue[bytes]"] = {}
+        self.writers: Dict[str, asyncio.Task] = {}
 
-    async def connect(self, websocket: WebSocket, session_id: str):
+    async def connect(self, websocket: WebSocket, session_id: str, batch: bool = False):
         await websocket.accept()
+        # A reconnect replaces the previous socket and its writer
+        self.disconnect(session_id)
         self.active_connections[session_id] = websocket
+        self.queues[session_id] = asyncio.Queue(maxsize=WS_QUEUE_SIZE)
+        self.writers[session_id] = asyncio.create_task(self._writer(session_id, batch))
         logger.info(f"WebSocket connected for session: {session_id}")
 
-    def disconnect(self, session_id: str):
+    def disconnect(self, session_id: str, websocket: Optional[WebSocket] = None):
+        """Drop a session's connection; with a websocket, only if it is still the current one"""
+        if websocket is not None and self.active_connections.get(session_id) is not websocket:
+            return
+        writer = self.writers.pop(session_id, None)
+        if writer is not None and writer is not asyncio.current_task():
+            writer.cancel()
+        self.queues.pop(session_id, None)
         if session_id in self.active_connections:
             del self.active_connections[session_id]
             logger.info(f"WebSocket disconnected for session: {session_id}")
 
-    async def send_personal_message(self, message: dict, session_id: str):
-        if session_id in self.active_connections:
-            websocket = self.active_connections[session_id]
+    async def send_personal_message(self, message: Union[dict, bytes], session_id: str):
+        """Queue a message; bytes are taken as an already serialized JSON object"""
+        queue = self.queues.get(session_id)
+        if queue is None:
+            return
+        try:
+            queue.put_nowait(message if isinstance(message, bytes) else orjson.dumps(message))
+        except asyncio.QueueFull:
+            logger.warning(f"WebSocket queue full for session {session_id}, dropping message")
+
+    async def _writer(self, session_id: str, batch_frames: bool):
+        """Send queued messages; with batch_frames a burst goes out as one frame"""
+        websocket = self.active_connections[session_id]
+        queue = self.queues[session_id]
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < WS_BATCH_SIZE:
+                try:
+                    batch.append(queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+
+            # A lone message keeps its original shape even for batching clients
+            if batch_frames and len(batch) > 1:
+                payloads = [b'{"type":"batch","items":[' + b",".join(batch) + b"]}"]
+            else:
+                payloads = batch
             try:
-                await websocket.send_text(json.dumps(message))
+                # Text frames, since browser clients JSON.parse event.data
+                for payload in payloads:
+                    await websocket.send_text(payload.decode())
             except Exception as e:
                 logger.error(f"Error sending WebSocket message: {e}")
-                self.disconnect(session_id)
+                self.disconnect(session_id, websocket)
+                return
 
 manager = ConnectionManager()
 
+# Query handler per agent type
+AGENT_HANDLERS = {
+    "document": process_document_query,
+    "database": process_database_query
+}
+
+# Agent instance getter per agent type
+AGENT_INSTANCES = {
+    "document": get_document_agent,
+    "database": get_database_agent
+}
+
+# Streaming query handler per agent type
+AGENT_STREAMERS = {
+    "document": stream_document_query,
+    "database": stream_database_query
+}
+
+# Agent calls go through a bounded queue per agent type drained by a fixed number
+# of workers, so load beyond AGENT_QUEUE_WORKERS waits instead of piling onto the
+# LLM, and a slow database agent cannot hold up document queries
+AGENT_QUEUE_WORKERS = int(os.getenv("AGENT_QUEUE_WORKERS", "8"))
+AGENT_QUEUE_SIZE = int(os.getenv("AGENT_QUEUE_SIZE", "256"))
+agent_queues: Dict[str, asyncio.Queue] = {}
+
+async def agent_worker(agent_type: str, queue: asyncio.Queue):
+    """Run queued agent calls one at a time and resolve their futures"""
+    handler = AGENT_HANDLERS[agent_type]
+    while True:
+        message, session_id, future = await queue.get()
+        # Skip calls whose caller has already gone away
+        if future.cancelled():
+            continue
+        try:
+            result = await handler(message, session_id)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+        else:
+            if not future.done():
+                future.set_result(result)
+
+def start_agent_workers() -> List[asyncio.Task]:
+    workers = []
+    for agent_type in AGENT_HANDLERS:
+        queue = asyncio.Queue(maxsize=AGENT_QUEUE_SIZE)
+        agent_queues[agent_type] = queue
+        workers.extend(
+            asyncio.create_task(agent_worker(agent_type, queue))
+            for _ in range(AGENT_QUEUE_WORKERS)
+        )
+    return workers
+
+async def run_agent(agent_type: str, message: str, session_id: Optional[str]) -> Dict[str, Any]:
+    """Queue an agent call and wait for a worker to answer it"""
+    queue = agent_queues.get(agent_type)
+    if queue is None:
+        return await AGENT_HANDLERS[agent_type](message, session_id)
+    future = asyncio.get_running_loop().create_future()
+    await queue.put((message, session_id, future))
+    return await future
+
+# Successful answers are cached in Redis by exact (agent_type, message). Only
+# opening messages are served from the cache: once a session has history the
+# answer depends on it. Database answers go stale as data changes, so only the
+# document agent is cached by default. Set RESPONSE_CACHE_TTL=0 to disable, or
+# pass metadata {"no_cache": true} per request
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "600"))
+RESPONSE_CACHE_AGENTS = {
+    name.strip() for name in os.getenv("RESPONSE_CACHE_AGENTS", "document").split(",") if name.strip()
+}
+response_cache_hits = Counter("agents_response_cache_hits_total", "Agent answers served from the response cache", ["agent_type"])
+response_cache_misses = Counter("agents_response_cache_misses_total", "Agent answers computed by the agent", ["agent_type"])
+
+def response_cache_key(agent_type: str, message: str) -> str:
+    digest = hashlib.blake2b(f"{agent_type}\x00{message}".encode(), digest_size=16).hexdigest()
+    return f"agents:answer:{digest}"
+
+async def resolve_answer(agent_type: str, message: str, session_id: Optional[str], use_cache: bool = True) -> Dict[str, Any]:
+    """Answer a message through the response cache, falling back to the agent"""
+    agent = AGENT_INSTANCES[agent_type]()
+    cacheable = (
+        use_cache
+        and RESPONSE_CACHE_TTL > 0
+        and agent_type in RESPONSE_CACHE_AGENTS
+        and not agent.get_conversation_history(session_id)
+    )
+    redis = get_redis() if cacheable else None
+    if redis is None:
+        return await run_agent(agent_type, message, session_id)
+
+    key = response_cache_key(agent_type, message)
+    try:
+        cached = await redis.get(key)
+    except Exception as e:
+        logger.warning(f"Response cache lookup failed: {e}")
+        cached = None
+    if cached is not None:
+        response_cache_hits.labels(agent_type).inc()
+        result = orjson.loads(cached)
+        # Keep the session's memory as if the agent had answered
+        agent.remember_exchange(message, result.get("answer", ""), session_id)
+        result["session_id"] = session_id
+        result["processing_time"] = 0
+        result["metadata"] = {**result.get("metadata", {}), "cached": True}
+        return result
+
+    response_cache_misses.labels(agent_type).inc()
+    result = await run_agent(agent_type, message, session_id)
+    # Errors are not cached so a transient failure is retried on the next request
+    if not result.get("error"):
+        try:
+            await redis.set(key, orjson.dumps(result), ex=RESPONSE_CACHE_TTL)
+        except Exception as e:
+            logger.warning(f"Response cache store failed: {e}")
+    return result
+
+# Agent memory and WebSocket sessions live in process memory, so more than one
+# worker only suits deployments without sticky-session requirements
+AGENTS_WORKERS = int(os.getenv("AGENTS_WORKERS", "1"))
+
+# Sync tools (database queries, file and HTTP tools) run in the loop's default
+# executor; an explicit size keeps a burst of tool calls from growing it unbounded
+TOOL_THREADS = int(os.getenv("AGENT_TOOL_THREADS", "32"))
+
+def create_missing_tables(conn: sa.Connection):
+    """Create missing tables and indexes (runs on the sync side of the async connection)"""
+    # Check if tables exist before creating
+    existing_tables = sa.inspect(conn).get_table_names()
+
+    # Create only missing tables
+    tables_to_create = []
+    for table in Base.metadata.tables.values():
+        if table.name not in existing_tables:
+            tables_to_create.append(table)
+
+    if tables_to_create:
+        logger.info(f"Creating missing tables: {[t.name for t in tables_to_create]}")
+        Base.metadata.create_all(bind=conn, tables=tables_to_create)
+    else:
+        logger.info("All required tables already exist")
+
+    # Indexes added to existing tables are not emitted by create_all
+    for table in Base.metadata.tables.values():
+        for table_index in table.indexes:
+            table_index.create(bind=conn, checkfirst=True)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Initialize services on startup"""
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=TOOL_THREADS, thread_name_prefix="agent-tool")
+    )
     try:
         # Create tables only if they don't exist
         try:
-            # Check if tables exist before creating
-            inspector = sa.inspect(engine)
-            existing_tables = inspector.get_table_names()
-
-            # Create only missing tables
-            tables_to_create = []
-            for table in Base.metadata.tables.values():
-                if table.name not in existing_tables:
-                    tables_to_create.append(table)
-
-            if tables_to_create:
-                logger.info(f"Creating missing tables: {[t.name for t in tables_to_create]}")
-                Base.metadata.create_all(bind=engine, tables=tables_to_create)
-            else:
-                logger.info("All required tables already exist")
-
+            async with engine.begin() as conn:
+                await conn.run_sync(create_missing_tables)
         except Exception as e:
             logger.error(f"Error checking/creating tables: {e}")
             # Fallback to create_all with checkfirst
-            Base.metadata.create_all(bind=engine, checkfirst=True)
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all, checkfirst=True)
         logger.info("Database initialized")
 
         # Initialize agents
         doc_agent = get_document_agent()
         db_agent = get_database_agent()
 
+        # Warm the model in the background so startup is not blocked on Ollama
+        warm_up_task = asyncio.create_task(doc_agent.warm_up())
+
+        # Start batched conversation writer
+        writer_task = asyncio.create_task(conversation_writer())
+
+        # Start the per-agent-type worker pools
+        agent_worker_tasks = start_agent_workers()
+
         logger.info("AI Agents service initialized successfully")
 
     except Exception as e:
@@ -188,12 +432,24 @@ async def lifespan(app: FastAPI):
 
     # Cleanup
     logger.info("Shutting down AI Agents service")
+    warm_up_task.cancel()
+    for task in agent_worker_tasks:
+        task.cancel()
+    agent_queues.clear()
+    writer_task.cancel()
+    try:
+        await writer_task
+    except asyncio.CancelledError:
+        pass
+    await close_rag_client()
+    await engine.dispose()
 
 # Initialize FastAPI app
 app = FastAPI(
     title="AI Box Agents Service",
     description="AI Agents service for document and database operations",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
@@ -207,35 +463,73 @@ app.add_middleware(
 )
 
 # Dependency to get database session
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
-async def save_conversation(
-    db: Session,
+# Conversations are written behind the response and flushed as multi-row INSERTs
+CONVERSATION_BATCH_SIZE = int(os.getenv("CONVERSATION_BATCH_SIZE", "100"))
+CONVERSATION_FLUSH_INTERVAL = float(os.getenv("CONVERSATION_FLUSH_INTERVAL", "0.5"))
+# Set CONVERSATION_PERSIST=0 to skip conversation storage entirely (e.g. for load tests)
+CONVERSATION_PERSIST = os.getenv("CONVERSATION_PERSIST", "1") == "1"
+conversation_queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+
+def save_conversation(
     session_id: str,
     agent_type: str,
     user_message: str,
     agent_response: str,
     metadata: Dict[str, Any]
 ):
-    """Save conversation to database"""
+    """Queue conversation for the batched database writer"""
+    if not CONVERSATION_PERSIST:
+        return
+    conversation_queue.put_nowait({
+        "session_id": session_id,
+        "agent_type": agent_type,
+        "user_message": user_message,
+        "agent_response": agent_response,
+        "conversation_metadata": metadata
+    })
+
+async def flush_conversations(rows: List[Dict[str, Any]]):
+    """Insert a batch of conversations in a single round-trip"""
+    async with SessionLocal() as db:
+        try:
+            await db.execute(sa.insert(ConversationModel), rows)
+            await db.commit()
+        except Exception as e:
+            logger.error(f"Error saving {len(rows)} conversations: {e}")
+            await db.rollback()
+
+async def conversation_writer():
+    """Drain the conversation queue and persist rows in batches"""
+    loop = asyncio.get_running_loop()
+    rows: List[Dict[str, Any]] = []
     try:
-        conversation = ConversationModel(
-            session_id=session_id,
-            agent_type=agent_type,
-            user_message=user_message,
-            agent_response=agent_response,
-            conversation_metadata=metadata
-        )
-        db.add(conversation)
-        db.commit()
-    except Exception as e:
-        logger.error(f"Error saving conversation: {e}")
-        db.rollback()
+        while True:
+            rows.append(await conversation_queue.get())
+            deadline = loop.time() + CONVERSATION_FLUSH_INTERVAL
+
+            while len(rows) < CONVERSATION_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    rows.append(await asyncio.wait_for(conversation_queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Rows stay buffered until the flush finishes, so a batch interrupted
+            # by shutdown is written again by the finally block below
+            await flush_conversations(rows)
+            rows = []
+    finally:
+        # Persist whatever is still buffered when the writer is stopped
+        while not conversation_queue.empty():
+            rows.append(conversation_queue.get_nowait())
+        if rows:
+            await flush_conversations(rows)
 
 # API endpoints
 @app.get("/health", response_model=HealthResponse)
@@ -259,8 +553,8 @@ async def health_check():
 
     # Check database connection
     try:
-        with engine.connect() as conn:
-            conn.execute(sa.text("SELECT 1"))
+        async with engine.connect() as conn:
+            await conn.execute(PING_QUERY)
         database_status = "healthy"
     except Exception:
         database_status = "unhealthy"
@@ -276,22 +570,18 @@ async def health_check():
     )
 
 @app.post("/agents/chat", response_model=AgentResponse)
-async def chat_with_agent(
-    request: AgentRequest,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
-):
+async def chat_with_agent(request: AgentRequest):
     """Chat with a specific agent"""
     try:
-        start_time = datetime.now()
-
         # Route to appropriate agent
-        if request.agent_type == "document":
-            result = await process_document_query(request.message, request.session_id)
-        elif request.agent_type == "database":
-            result = await process_database_query(request.message, request.session_id)
-        else:
+        if request.agent_type not in AGENT_HANDLERS:
             raise HTTPException(status_code=400, detail=f"Unknown agent type: {request.agent_type}")
+        result = await resolve_answer(
+            request.agent_type,
+            request.message,
+            request.session_id,
+            use_cache=not (request.metadata or {}).get("no_cache")
+        )
 
         # Create response
         response = AgentResponse(
@@ -303,10 +593,8 @@ async def chat_with_agent(
             timestamp=datetime.now().isoformat()
         )
 
-        # Save conversation in background
-        background_tasks.add_task(
-            save_conversation,
-            db,
+        # Queue conversation for the batched writer
+        save_conversation(
             request.session_id or "anonymous",
             request.agent_type,
             request.message,
@@ -318,14 +606,17 @@ async def chat_with_agent(
             }
         )
 
+        # Serialize once; the same bytes are the HTTP body and the WebSocket payload
+        body = orjson.dumps(response.model_dump())
+
         # Send WebSocket notification if session is connected
         if request.session_id:
-            await manager.send_personal_message({
-                "type": "agent_response",
-                "data": response.dict()
-            }, request.session_id)
+            await manager.send_personal_message(
+                b'{"type":"agent_response","data":' + body + b"}",
+                request.session_id
+            )
 
-        return response
+        return Response(content=body, media_type="application/json")
 
     except HTTPException:
         raise
@@ -333,40 +624,116 @@ async def chat_with_agent(
         logger.error(f"Error in agent chat: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@app.post("/agents/chat/stream")
+async def stream_chat_with_agent(request: AgentRequest):
+    """Chat with a specific agent, streaming answer tokens as server-sent events"""
+    streamer = AGENT_STREAMERS.get(request.agent_type)
+    if streamer is None:
+        raise HTTPException(status_code=400, detail=f"Unknown agent type: {request.agent_type}")
+
+    async def event_stream():
+        async for event in streamer(request.message, request.session_id):
+            if event["type"] == "done":
+                # Queue conversation for the batched writer
+                save_conversation(
+                    request.session_id or "anonymous",
+                    request.agent_type,
+                    request.message,
+                    event["answer"],
+                    {
+                        "user_id": request.user_id,
+                        "processing_time": event["processing_time"],
+                        "request_metadata": request.metadata
+                    }
+                )
+            yield b"data: " + orjson.dumps(event) + b"\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+@app.post("/agents/batch", response_model=BatchAgentResponse)
+async def batch_with_agent(request: BatchAgentRequest):
+    """Process several messages with one agent concurrently"""
+    if request.agent_type not in AGENT_HANDLERS:
+        raise HTTPException(status_code=400, detail=f"Unknown agent type: {request.agent_type}")
+    session_ids = request.session_ids or [None] * len(request.messages)
+    if len(session_ids) != len(request.messages):
+        raise HTTPException(status_code=400, detail="session_ids must have one entry per message")
+
+    semaphore = asyncio.Semaphore(request.max_concurrency)
+
+    async def process_one(message: str, session_id: Optional[str]) -> AgentResponse:
+        async with semaphore:
+            result = await run_agent(request.agent_type, message, session_id)
+
+        response = AgentResponse(
+            answer=result.get("answer", ""),
+            agent_type=request.agent_type,
+            session_id=session_id,
+            processing_time=result.get("processing_time", 0),
+            metadata=result.get("metadata", {}),
+            timestamp=datetime.now().isoformat()
+        )
+        save_conversation(
+            session_id or "anonymous",
+            request.agent_type,
+            message,
+            response.answer,
+            {
+                "user_id": request.user_id,
+                "processing_time": response.processing_time,
+                "request_metadata": request.metadata
+            }
+        )
+        return response
+
+    try:
+        # Agent handlers report their own errors in the result, so one failing
+        # message does not fail the batch
+        results = await asyncio.gather(
+            *(process_one(message, session_id) for message, session_id in zip(request.messages, session_ids))
+        )
+        return BatchAgentResponse(results=results, total_count=len(results))
+
+    except Exception as e:
+        logger.error(f"Error in agent batch: {e}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
 @app.post("/sessions", response_model=SessionResponse)
-async def create_session(request: SessionRequest, db: Session = Depends(get_db)):
+async def create_session(request: SessionRequest, db: AsyncSession = Depends(get_db)):
     """Create a new agent session"""
     try:
         session_id = str(uuid.uuid4())
 
-        session = AgentSessionModel(
-            session_id=session_id,
-            user_id=request.user_id,
-            agent_type=request.agent_type,
-            session_metadata=request.metadata
+        # One INSERT ... RETURNING instead of insert + refresh round-trips
+        created_at = await db.scalar(
+            sa.insert(AgentSessionModel).values(
+                session_id=session_id,
+                user_id=request.user_id,
+                agent_type=request.agent_type,
+                session_metadata=request.metadata
+            ).returning(AgentSessionModel.created_at)
         )
-
-        db.add(session)
-        db.commit()
-        db.refresh(session)
+        await db.commit()
 
         return SessionResponse(
             session_id=session_id,
             agent_type=request.agent_type,
             status="active",
-            created_at=session.created_at.isoformat()
+            created_at=created_at.isoformat()
         )
 
     except Exception as e:
         logger.error(f"Error creating session: {e}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error creating session: {str(e)}")
 
 @app.delete("/sessions/{session_id}")
-async def delete_session(session_id: str, db: Session = Depends(get_db)):
+async def delete_session(session_id: str, db: AsyncSession = Depends(get_db)):
     """Delete an agent session"""
     try:
-        session = db.query(AgentSessionModel).filter(AgentSessionModel.session_id == session_id).first()
+        session = await db.scalar(
+            sa.select(AgentSessionModel).where(AgentSessionModel.session_id == session_id).limit(1)
+        )
         if not session:
             raise HTTPException(status_code=404, detail="Session not found")
 
@@ -380,7 +747,7 @@ async def delete_session(session_id: str, db: Session = Depends(get_db)):
 
         # Update session status
         session.status = "closed"
-        db.commit()
+        await db.commit()
 
         # Disconnect WebSocket if connected
         manager.disconnect(session_id)
@@ -391,53 +758,53 @@ async def delete_session(session_id: str, db: Session = Depends(get_db)):
         raise
     except Exception as e:
         logger.error(f"Error deleting session: {e}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error deleting session: {str(e)}")
 
 @app.get("/sessions/{session_id}/history", response_model=ConversationHistoryResponse)
-async def get_conversation_history(session_id: str, db: Session = Depends(get_db)):
+async def get_conversation_history(session_id: str, db: AsyncSession = Depends(get_db)):
     """Get conversation history for a session"""
     try:
-        conversations = db.query(ConversationModel).filter(
-            ConversationModel.session_id == session_id
-        ).order_by(ConversationModel.created_at).all()
-
-        history = []
-        for conv in conversations:
-            history.append({
-                "id": conv.id,
-                "user_message": conv.user_message,
-                "agent_response": conv.agent_response,
-                "agent_type": conv.agent_type,
-                "metadata": conv.conversation_metadata,
-                "created_at": conv.created_at.isoformat()
-            })
-
-        return ConversationHistoryResponse(
-            session_id=session_id,
-            conversations=history,
-            total_count=len(history)
-        )
+        result = await db.execute(HISTORY_QUERY, {"session_id": session_id})
+
+        history = [
+            {**row, "created_at": row["created_at"].isoformat()}
+            for row in result.mappings()
+        ]
+
+        # Plain dicts go straight to orjson, skipping model validation and jsonable_encoder
+        return ORJSONResponse({
+            "session_id": session_id,
+            "conversations": history,
+            "total_count": len(history)
+        })
 
     except Exception as e:
         logger.error(f"Error getting conversation history: {e}")
         raise HTTPException(status_code=500, detail=f"Error getting history: {str(e)}")
 
-@app.get("/tools", response_model=ToolListResponse)
-async def list_tools():
-    """List available tools"""
-    try:
-        tools = get_custom_tools()
-        tool_info = []
+# The tool set is fixed at runtime, so the /tools body is built once
+_tool_list_body: Optional[bytes] = None
 
-        for tool in tools:
-            tool_info.append({
+def get_tool_list_body() -> bytes:
+    global _tool_list_body
+    if _tool_list_body is None:
+        tool_info = [
+            {
                 "name": tool.name,
                 "description": tool.description,
                 "args_schema": tool.args_schema.schema() if tool.args_schema else None
-            })
+            }
+            for tool in get_custom_tools()
+        ]
+        _tool_list_body = orjson.dumps({"tools": tool_info})
+    return _tool_list_body
 
-        return ToolListResponse(tools=tool_info)
+@app.get("/tools", response_model=ToolListResponse)
+async def list_tools():
+    """List available tools"""
+    try:
+        return Response(content=get_tool_list_body(), media_type="application/json")
 
     except Exception as e:
         logger.error(f"Error listing tools: {e}")
@@ -451,8 +818,8 @@ async def execute_tool(tool_name: str, args: Dict[str, Any]):
         if not tool:
             raise HTTPException(status_code=404, detail=f"Tool '{tool_name}' not found")
 
-        # Execute tool
-        result = tool._run(**args)
+        # Tools do blocking I/O (HTTP, files, SQL), so run them off the event loop
+        result = await asyncio.to_thread(tool._run, **args)
 
         return {
             "success": True,
@@ -469,9 +836,9 @@ async def execute_tool(tool_name: str, args: Dict[str, Any]):
         raise HTTPException(status_code=500, detail=f"Error executing tool: {str(e)}")
 
 @app.websocket("/ws/{session_id}")
-async def websocket_endpoint(websocket: WebSocket, session_id: str):
+async def websocket_endpoint(websocket: WebSocket, session_id: str, batch: bool = False):
     """WebSocket endpoint for real-time communication"""
-    await manager.connect(websocket, session_id)
+    await manager.connect(websocket, session_id, batch)
 
     try:
         while True:
@@ -479,7 +846,7 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
             data = await websocket.receive_text()
 
             try:
-                message = json.loads(data)
+                message = orjson.loads(data)
 
                 if message.get("type") == "chat":
                     # Process chat message
@@ -487,10 +854,13 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
                     user_message = message.get("message", "")
 
                     # Route to appropriate agent
-                    if agent_type == "document":
-                        result = await process_document_query(user_message, session_id)
-                    elif agent_type == "database":
-                        result = await process_database_query(user_message, session_id)
+                    if agent_type in AGENT_HANDLERS:
+                        result = await resolve_answer(
+                            agent_type,
+                            user_message,
+                            session_id,
+                            use_cache=not message.get("no_cache")
+                        )
                     else:
                         result = {"answer": f"Unknown agent type: {agent_type}", "error": True}
 
@@ -507,7 +877,7 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
                         "timestamp": datetime.now().isoformat()
                     }, session_id)
 
-            except json.JSONDecodeError:
+            except orjson.JSONDecodeError:
                 await manager.send_personal_message({
                     "type": "error",
                     "message": "Invalid JSON format"
@@ -521,12 +891,13 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
     except Exception as e:
         logger.error(f"WebSocket error for session {session_id}: {e}")
     finally:
-        manager.disconnect(session_id)
+        # A reconnect with the same session_id may already have replaced this socket
+        manager.disconnect(session_id, websocket)
 
 @app.get("/metrics")
 async def metrics():
     """Prometheus metrics endpoint"""
-    return Response(generate_latest(), media_type="text/plain")
+    return Response(await asyncio.to_thread(generate_latest), media_type=CONTENT_TYPE_LATEST)
 
 if __name__ == "__main__":
     uvicorn.run(
@@ -534,6 +905,9 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=8002,
         reload=False,
-        workers=1,  # Single worker for WebSocket support
+        workers=AGENTS_WORKERS,
+        loop="uvloop",
+        http="httptools",
+        ws="websockets",
         log_level="info"
     )
\ No newline at end of file
@@ -9,17 +9,47 @@ import asyncio
 from typing import List, Dict, Any, Optional, Union
 from datetime import datetime, timedelta
 from urllib.parse import urlparse
+from http.cookiejar import DefaultCookiePolicy
 import hashlib
+import stat
 
 from langchain_core.tools import BaseTool, StructuredTool
 from pydantic import BaseModel, Field
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import aiohttp
 import subprocess
 import tempfile
 
 logger = logging.getLogger(__name__)
 
+# Process umask, read once at import; new files written atomically get the mode
+# a plain open() would have given them
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+# Pooled HTTP session shared by the sync tools; they run in worker threads,
+# so the pool is sized for concurrent calls and connection failures are retried
+_http_session: Optional[requests.Session] = None
+
+def get_http_session() -> requests.Session:
+    """Get or create the shared HTTP session"""
+    global _http_session
+    if _http_session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=32,
+            pool_maxsize=32,
+            max_retries=Retry(total=2, backoff_factor=0.2)
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        # Calls are independent, so cookies must not carry over between them
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        _http_session = session
+    return _http_session
+
 class APICallInput(BaseModel):
     """Input schema for API call tool"""
     url: str = Field(description="URL to make the API call to")
@@ -82,7 +112,7 @@ class APICallTool(BaseTool):
             headers = headers or {}
             headers.setdefault("User-Agent", "AI-Box-Agent/1.0")
 
-            response = requests.request(
+            response = get_http_session().request(
                 method=method.upper(),
                 url=url,
                 headers=headers,
@@ -143,9 +173,27 @@ class FileOperationTool(BaseTool):
                 if content is None:
                     return json.dumps({"error": "Content required for write operation"})
 
-                os.makedirs(os.path.dirname(abs_path), exist_ok=True)
-                with open(abs_path, 'w', encoding=encoding) as f:
-                    f.write(content)
+                # Encode once and swap the file in atomically so readers never see a partial write.
+                # A symlink is followed so its target is replaced, not the link itself
+                target_path = os.path.realpath(abs_path)
+                target_dir = os.path.dirname(target_path)
+                os.makedirs(target_dir, exist_ok=True)
+                try:
+                    mode = stat.S_IMODE(os.stat(target_path).st_mode)
+                except FileNotFoundError:
+                    mode = 0o666 & ~_UMASK
+                fd, tmp_path = tempfile.mkstemp(dir=target_dir, prefix=".", suffix=".tmp")
+                try:
+                    with os.fdopen(fd, 'wb') as f:
+                        f.write(content.encode(encoding))
+                    os.chmod(tmp_path, mode)
+                    os.replace(tmp_path, target_path)
+                except BaseException:
+                    try:
+                        os.unlink(tmp_path)
+                    except OSError:
+                        pass
+                    raise
 
                 return json.dumps({
                     "success": True,
@@ -459,7 +507,7 @@ class WebScrapingTool(BaseTool):
                 "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8"
             }
 
-            response = requests.get(url, headers=headers, timeout=30)
+            response = get_http_session().get(url, headers=headers, timeout=30)
             response.raise_for_status()
 
             # Parse HTML
@@ -511,21 +559,13 @@ CUSTOM_TOOLS = [
     DataTransformTool()
 ]
 
+# Tools are stateless, so the CUSTOM_TOOLS instances are shared by every caller
+_tools_by_name: Dict[str, BaseTool] = {tool.name: tool for tool in CUSTOM_TOOLS}
+
 def get_custom_tools() -> List[BaseTool]:
     """Get list of all custom tools"""
-    return [
-        APICallTool(),
-        FileOperationTool(),
-        TextProcessingTool(),
-        CalculationTool(),
-        WebScrapingTool(),
-        DataTransformTool()
-    ]
+    return list(CUSTOM_TOOLS)
 
 def get_tool_by_name(name: str) -> Optional[BaseTool]:
     """Get a specific tool by name"""
-    tools = get_custom_tools()
-    for tool in tools:
-        if tool.name == name:
-            return tool
-    return None
\ No newline at end of file
+    return _tools_by_name.get(name)
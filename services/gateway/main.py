@@ -4,12 +4,14 @@ Gateway Service - Unified API Gateway for AI Box
 
 import logging
 import os
-import json
 import asyncio
+import gzip
 import hashlib
 import hmac
 import uuid
-from typing import Dict, Any, List, Optional, Union
+import time
+from typing import Dict, Any, List, Optional, Set, Tuple, Union
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from contextlib import asynccontextmanager
 
@@ -17,11 +19,12 @@ import uvicorn
 from fastapi import FastAPI, HTTPException, WebSocket, Depends, Request, BackgroundTasks, Header
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import JSONResponse, HTMLResponse, Response
+from fastapi.responses import JSONResponse, HTMLResponse, ORJSONResponse, Response
 from pydantic import BaseModel, Field
 import aiohttp
+import orjson
 import requests
-from prometheus_client import Counter, Histogram, Gauge, generate_latest
+from prometheus_client import Counter, Histogram, Gauge, generate_latest, CONTENT_TYPE_LATEST, REGISTRY
 import structlog
 
 # Configure structured logging
@@ -43,17 +46,52 @@ structlog.configure(
 
 logger = structlog.get_logger()
 
-# Prometheus metrics
-REQUEST_COUNT = Counter('gateway_requests_total', 'Total requests', ['method', 'endpoint', 'status'])
-REQUEST_DURATION = Histogram('gateway_request_duration_seconds', 'Request duration')
-ACTIVE_CONNECTIONS = Gauge('gateway_active_websocket_connections', 'Active WebSocket connections')
-SERVICE_REQUESTS = Counter('gateway_service_requests_total', 'Requests to backend services', ['service', 'status'])
+# Prometheus metrics. Running `python main.py` imports this module twice (as
+# __main__ and again as main:app), so reuse collectors that are already registered.
+_registered_metrics = dict(REGISTRY._names_to_collectors)
+
+REQUEST_COUNT = _registered_metrics.get('gateway_requests_total') or \
+    Counter('gateway_requests_total', 'Total requests', ['method', 'endpoint', 'status'])
+REQUEST_DURATION = _registered_metrics.get('gateway_request_duration_seconds') or \
+    Histogram('gateway_request_duration_seconds', 'Request duration')
+ACTIVE_CONNECTIONS = _registered_metrics.get('gateway_active_websocket_connections') or \
+    Gauge('gateway_active_websocket_connections', 'Active WebSocket connections')
+SERVICE_REQUESTS = _registered_metrics.get('gateway_service_requests_total') or \
+    Counter('gateway_service_requests_total', 'Requests to backend services', ['service', 'status'])
+
+# Request counter children keyed by (method, route template, status), LRU-bounded;
+# the hottest endpoints are bound up front
+REQUEST_COUNTER_CACHE_SIZE = 256
+_REQUEST_COUNTERS: "OrderedDict[Tuple[str, str, int], Any]" = OrderedDict(
+    ((method, path, 200), REQUEST_COUNT.labels(method=method, endpoint=path, status=200))
+    for method, path in [("GET", "/health"), ("GET", "/metrics"), ("POST", "/chat"), ("POST", "/query")]
+)
+
+def get_request_counter(method: str, endpoint: str, status: int):
+    """Get the REQUEST_COUNT child for a label set, binding it at most once"""
+    key = (method, endpoint, status)
+    counter = _REQUEST_COUNTERS.get(key)
+    if counter is None:
+        counter = REQUEST_COUNT.labels(method=method, endpoint=endpoint, status=status)
+        _REQUEST_COUNTERS[key] = counter
+        if len(_REQUEST_COUNTERS) > REQUEST_COUNTER_CACHE_SIZE:
+            _REQUEST_COUNTERS.popitem(last=False)
+    else:
+        _REQUEST_COUNTERS.move_to_end(key)
+    return counter
+
+# Rendered /metrics payload, shared between scrapes for METRICS_CACHE_TTL seconds
+METRICS_CACHE_TTL = float(os.getenv("METRICS_CACHE_TTL", "5"))
+_metrics_cache = {"body": b"", "ts": 0.0}
+_metrics_lock = asyncio.Lock()
 
 # Configuration
 SECRET_KEY = os.getenv("GATEWAY_SECRET_KEY", "default-secret-key-change-in-production")
 API_TOKEN = os.getenv("API_TOKEN", "default-api-token-change-in-production")
 GATEWAY_HOST = os.getenv("GATEWAY_HOST", "0.0.0.0")
 GATEWAY_PORT = int(os.getenv("GATEWAY_PORT", "5000"))
+# WebSocket clients and connectors live in process memory, so scale out with care
+GATEWAY_WORKERS = int(os.getenv("GATEWAY_WORKERS", "1"))
 
 # Service URLs
 OLLAMA_API_BASE = os.getenv("OLLAMA_API_BASE", "http://ollama:11434")
@@ -139,6 +177,10 @@ def verify_webhook_signature(payload: str, signature: str, secret: str) -> bool:
     expected_signature = create_webhook_signature(payload, secret)
     return hmac.compare_digest(signature, expected_signature)
 
+def orjson_serialize(obj: Any) -> str:
+    """JSON serializer for aiohttp request bodies"""
+    return orjson.dumps(obj).decode()
+
 # Service proxy class
 class ServiceProxy:
     """Proxy for backend services"""
@@ -152,7 +194,7 @@ class ServiceProxy:
         self.session = None
     
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession()
+        self.session = aiohttp.ClientSession(json_serialize=orjson_serialize)
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
@@ -160,8 +202,9 @@ class ServiceProxy:
             await self.session.close()
     
     async def request(self, service: str, endpoint: str, method: str = "POST", 
-                     data: Dict[str, Any] = None, headers: Dict[str, str] = None) -> Dict[str, Any]:
-        """Make request to backend service"""
+                     data: Dict[str, Any] = None, headers: Dict[str, str] = None,
+                     raw: bool = False) -> Union[Dict[str, Any], bytes]:
+        """Make request to backend service; with raw=True the JSON body is returned undecoded"""
         if service not in self.service_urls:
             raise HTTPException(status_code=400, detail=f"Unknown service: {service}")
         
@@ -185,8 +228,8 @@ class ServiceProxy:
                                service=service, url=url, status=response.status, error=error_text)
                     raise HTTPException(status_code=response.status, detail=error_text)
                 
-                result = await response.json()
-                return result
+                body = await response.read()
+                return body if raw else orjson.loads(body)
                 
         except aiohttp.ClientError as e:
             SERVICE_REQUESTS.labels(service=service, status="error").inc()
@@ -197,48 +240,69 @@ class ServiceProxy:
 class ConnectionManager:
     def __init__(self):
         self.active_connections: Dict[str, WebSocket] = {}
-        self.user_sessions: Dict[str, List[str]] = {}
+        self.user_sessions: Dict[str, Set[str]] = {}
     
     async def connect(self, websocket: WebSocket, client_id: str, user_id: str = None):
         await websocket.accept()
         self.active_connections[client_id] = websocket
         
         if user_id:
-            if user_id not in self.user_sessions:
-                self.user_sessions[user_id] = []
-            self.user_sessions[user_id].append(client_id)
+            self.user_sessions.setdefault(user_id, set()).add(client_id)
         
-        ACTIVE_CONNECTIONS.inc()
+        ACTIVE_CONNECTIONS.set(len(self.active_connections))
         logger.info("WebSocket connected", client_id=client_id, user_id=user_id)
     
     def disconnect(self, client_id: str, user_id: str = None):
-        if client_id in self.active_connections:
-            del self.active_connections[client_id]
-            ACTIVE_CONNECTIONS.dec()
+        if self.active_connections.pop(client_id, None) is not None:
+            ACTIVE_CONNECTIONS.set(len(self.active_connections))
         
         if user_id and user_id in self.user_sessions:
-            if client_id in self.user_sessions[user_id]:
-                self.user_sessions[user_id].remove(client_id)
+            self.user_sessions[user_id].discard(client_id)
             if not self.user_sessions[user_id]:
                 del self.user_sessions[user_id]
         
         logger.info("WebSocket disconnected", client_id=client_id, user_id=user_id)
     
     async def send_personal_message(self, message: dict, client_id: str):
+        await self.send_frame(orjson.dumps(message), client_id)
+    
+    async def send_frame(self, frame: bytes, client_id: str):
+        """Send an already encoded JSON frame as a text message"""
         if client_id in self.active_connections:
             try:
-                await self.active_connections[client_id].send_text(json.dumps(message))
+                await self.active_connections[client_id].send_text(frame.decode())
             except Exception as e:
                 logger.error("Failed to send WebSocket message", client_id=client_id, error=str(e))
                 self.disconnect(client_id)
     
     async def broadcast_to_user(self, message: dict, user_id: str):
-        if user_id in self.user_sessions:
-            for client_id in self.user_sessions[user_id]:
-                await self.send_personal_message(message, client_id)
+        """Send one message to every session of a user concurrently"""
+        client_ids = [
+            client_id for client_id in self.user_sessions.get(user_id, ())
+            if client_id in self.active_connections
+        ]
+        if not client_ids:
+            return
+        
+        # Encode once and share the frame across all sockets
+        text = orjson.dumps(message).decode()
+        results = await asyncio.gather(
+            *(self.active_connections[client_id].send_text(text) for client_id in client_ids),
+            return_exceptions=True
+        )
+        
+        # Drop dead sockets in a single pass
+        for client_id, result in zip(client_ids, results):
+            if isinstance(result, Exception):
+                logger.error("Failed to send WebSocket message", client_id=client_id, error=str(result))
+                self.disconnect(client_id, user_id)
 
 manager = ConnectionManager()
 
+# Constant WebSocket frames, encoded once
+_INVALID_JSON_FRAME = orjson.dumps({"type": "error", "message": "Invalid JSON format"})
+_CHAT_RESPONSE_PREFIX = b'{"type":"chat_response","data":'
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Initialize services on startup"""
@@ -251,12 +315,25 @@ app = FastAPI(
     title="AI Box Gateway",
     description="Unified API Gateway for AI Box Enterprise Solution",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
+class InternalAwareCORSMiddleware(CORSMiddleware):
+    """CORS middleware that lets origin-less scrapes and probes straight through"""
+    
+    BYPASS_PATHS = frozenset({"/health", "/metrics"})
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in self.BYPASS_PATHS:
+            if not any(name == b"origin" for name, _ in scope["headers"]):
+                await self.app(scope, receive, send)
+                return
+        await super().__call__(scope, receive, send)
+
 # Add CORS middleware
 app.add_middleware(
-    CORSMiddleware,
+    InternalAwareCORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
@@ -266,18 +343,15 @@ app.add_middleware(
 # Request logging middleware
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    start_time = datetime.now()
-    
-    with REQUEST_DURATION.time():
-        response = await call_next(request)
-    
-    processing_time = (datetime.now() - start_time).total_seconds()
+    start_time = time.perf_counter()
+    response = await call_next(request)
+    processing_time = time.perf_counter() - start_time
+    REQUEST_DURATION.observe(processing_time)
     
-    REQUEST_COUNT.labels(
-        method=request.method,
-        endpoint=request.url.path,
-        status=response.status_code
-    ).inc()
+    # Label by route template so path parameters don't explode cardinality
+    route = request.scope.get("route")
+    endpoint = route.path if route is not None else "<unmatched>"
+    get_request_counter(request.method, endpoint, response.status_code).inc()
     
     logger.info(
         "Request processed",
@@ -290,43 +364,56 @@ async def log_requests(request: Request, call_next):
     
     return response
 
+# Root page is static, so encode (and compress) it once at import time
+INDEX_HTML = """
+<!DOCTYPE html>
+<html>
+<head>
+    <title>AI Box Gateway</title>
+    <style>
+        body { font-family: Arial, sans-serif; margin: 40px; }
+        .header { background: #f5f5f5; padding: 20px; border-radius: 5px; }
+        .endpoint { margin: 10px 0; padding: 10px; background: #f9f9f9; border-radius: 3px; }
+    </style>
+</head>
+<body>
+    <div class="header">
+        <h1>AI Box Gateway API</h1>
+        <p>Unified API Gateway for AI Box Enterprise Solution</p>
+    </div>
+    
+    <h2>Available Endpoints:</h2>
+    <div class="endpoint"><strong>GET /health</strong> - Health check</div>
+    <div class="endpoint"><strong>POST /chat</strong> - Chat with AI agents</div>
+    <div class="endpoint"><strong>POST /query</strong> - Query documents or data</div>
+    <div class="endpoint"><strong>POST /proxy</strong> - Proxy requests to backend services</div>
+    <div class="endpoint"><strong>GET /docs</strong> - Interactive API documentation</div>
+    <div class="endpoint"><strong>WS /ws/{client_id}</strong> - WebSocket connection</div>
+    
+    <h2>Connectors:</h2>
+    <div class="endpoint"><strong>POST /connectors</strong> - Create integration connector</div>
+    <div class="endpoint"><strong>POST /webhooks/{connector_id}</strong> - Webhook endpoint</div>
+    
+    <p><a href="/docs">View Interactive API Documentation</a></p>
+</body>
+</html>
+"""
+_INDEX_BYTES = INDEX_HTML.encode("utf-8")
+_INDEX_GZ = gzip.compress(_INDEX_BYTES)
+_INDEX_HEADERS = {"Cache-Control": "public, max-age=300", "Vary": "Accept-Encoding"}
+
 # API endpoints
 @app.get("/", response_class=HTMLResponse)
-async def root():
+async def root(request: Request):
     """Root endpoint with API documentation"""
-    return """
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>AI Box Gateway</title>
-        <style>
-            body { font-family: Arial, sans-serif; margin: 40px; }
-            .header { background: #f5f5f5; padding: 20px; border-radius: 5px; }
-            .endpoint { margin: 10px 0; padding: 10px; background: #f9f9f9; border-radius: 3px; }
-        </style>
-    </head>
-    <body>
-        <div class="header">
-            <h1>AI Box Gateway API</h1>
-            <p>Unified API Gateway for AI Box Enterprise Solution</p>
-        </div>
-        
-        <h2>Available Endpoints:</h2>
-        <div class="endpoint"><strong>GET /health</strong> - Health check</div>
-        <div class="endpoint"><strong>POST /chat</strong> - Chat with AI agents</div>
-        <div class="endpoint"><strong>POST /query</strong> - Query documents or data</div>
-        <div class="endpoint"><strong>POST /proxy</strong> - Proxy requests to backend services</div>
-        <div class="endpoint"><strong>GET /docs</strong> - Interactive API documentation</div>
-        <div class="endpoint"><strong>WS /ws/{client_id}</strong> - WebSocket connection</div>
-        
-        <h2>Connectors:</h2>
-        <div class="endpoint"><strong>POST /connectors</strong> - Create integration connector</div>
-        <div class="endpoint"><strong>POST /webhooks/{connector_id}</strong> - Webhook endpoint</div>
-        
-        <p><a href="/docs">View Interactive API Documentation</a></p>
-    </body>
-    </html>
-    """
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        return Response(
+            content=_INDEX_GZ,
+            media_type="text/html",
+            headers={**_INDEX_HEADERS, "Content-Encoding": "gzip"}
+        )
+    
+    return Response(content=_INDEX_BYTES, media_type="text/html", headers=_INDEX_HEADERS)
 
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
@@ -516,8 +603,8 @@ async def webhook_handler(
         
         # Parse webhook data
         try:
-            webhook_data = json.loads(payload)
-        except json.JSONDecodeError:
+            webhook_data = orjson.loads(body)
+        except orjson.JSONDecodeError:
             webhook_data = {"raw_payload": payload}
         
         # Process webhook in background
@@ -563,7 +650,7 @@ async def process_webhook(connector_id: str, data: Dict[str, Any]):
         # Send response back if webhook URL is configured
         response_url = connector["config"].get("response_url")
         if response_url:
-            async with aiohttp.ClientSession() as session:
+            async with aiohttp.ClientSession(json_serialize=orjson_serialize) as session:
                 await session.post(response_url, json={
                     "response": result.get("answer", ""),
                     "user_id": user_id,
@@ -585,7 +672,7 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str, user_id: str
             data = await websocket.receive_text()
             
             try:
-                message = json.loads(data)
+                message = orjson.loads(data)
                 
                 if message.get("type") == "chat":
                     # Process chat message
@@ -600,13 +687,12 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str, user_id: str
                                 "session_id": message.get("session_id"),
                                 "user_id": user_id,
                                 "metadata": message.get("metadata", {})
-                            }
+                            },
+                            raw=True
                         )
                     
-                    await manager.send_personal_message({
-                        "type": "chat_response",
-                        "data": result
-                    }, client_id)
+                    # Splice the agent's JSON body into the envelope without re-encoding it
+                    await manager.send_frame(_CHAT_RESPONSE_PREFIX + result + b"}", client_id)
                 
                 elif message.get("type") == "ping":
                     await manager.send_personal_message({
@@ -614,11 +700,8 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str, user_id: str
                         "timestamp": datetime.now().isoformat()
                     }, client_id)
                 
-            except json.JSONDecodeError:
-                await manager.send_personal_message({
-                    "type": "error",
-                    "message": "Invalid JSON format"
-                }, client_id)
+            except orjson.JSONDecodeError:
+                await manager.send_frame(_INVALID_JSON_FRAME, client_id)
                 
     except Exception as e:
         logger.error("WebSocket error", client_id=client_id, error=str(e))
@@ -628,7 +711,12 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str, user_id: str
 @app.get("/metrics")
 async def metrics():
     """Prometheus metrics endpoint"""
-    return Response(generate_latest(), media_type="text/plain")
+    async with _metrics_lock:
+        if time.monotonic() - _metrics_cache["ts"] > METRICS_CACHE_TTL:
+            _metrics_cache["body"] = await asyncio.to_thread(generate_latest)
+            _metrics_cache["ts"] = time.monotonic()
+    
+    return Response(_metrics_cache["body"], media_type=CONTENT_TYPE_LATEST)
 
 if __name__ == "__main__":
     uvicorn.run(
@@ -636,6 +724,9 @@ if __name__ == "__main__":
         host=GATEWAY_HOST,
         port=GATEWAY_PORT,
         reload=False,
-        workers=1,  # Single worker for WebSocket support
+        workers=GATEWAY_WORKERS,
+        loop="uvloop",
+        http="httptools",
+        access_log=False,  # requests are already logged by the middleware
         log_level="info"
     )
@@ -21,15 +21,17 @@ POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD", "postgres")
 import logging
 import asyncio
 import hashlib
+import time
 from typing import List, Optional, Dict, Any
 from contextlib import asynccontextmanager
 
 import uvicorn
+import requests
 from fastapi import FastAPI, HTTPException, UploadFile, File, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import Response
 from pydantic import BaseModel, Field
-from prometheus_client import Counter, Histogram, Gauge, generate_latest
+from prometheus_client import Counter, Histogram, Gauge, generate_latest, CONTENT_TYPE_LATEST
 
 # LlamaIndex imports
 from llama_index.core import VectorStoreIndex, Document, Settings
@@ -45,7 +47,9 @@ from qdrant_client.models import Distance, VectorParams
 # Database
 import sqlalchemy as sa
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
 # Document processing
 import aiofiles
@@ -59,18 +63,80 @@ import io
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Prefer libyaml's C loader; the pure-Python fallback is several times slower
+try:
+    from yaml import CSafeLoader as YAMLLoader
+except ImportError:
+    from yaml import SafeLoader as YAMLLoader
+    logger.warning("PyYAML is built without libyaml, falling back to the pure-Python loader")
+
 # Load configuration
 config_path = os.path.join(os.path.dirname(__file__), "config.yaml")
 with open(config_path, "r") as f:
-    config = yaml.safe_load(f)
+    config = yaml.load(f, Loader=YAMLLoader)
 
 # Database setup
 DATABASE_URL = os.getenv('DATABASE_URL', f'postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}')
 
-engine = sa.create_engine(DATABASE_URL)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "30"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "3600"))
+
+# TCP keepalives are libpq options, so only pass them to PostgreSQL
+connect_args = {}
+if DATABASE_URL.startswith("postgresql"):
+    connect_args = {
+        "keepalives": 1,
+        "keepalives_idle": 30,
+        "keepalives_interval": 10,
+        "keepalives_count": 5
+    }
+
+# The sync engine only runs the startup DDL, so it holds no pooled connections
+engine = sa.create_engine(
+    DATABASE_URL,
+    poolclass=NullPool,
+    connect_args=connect_args
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+def get_async_database_url(url: str) -> str:
+    """Map a sync database URL onto its asyncio driver"""
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    return url
+
+# Request handlers use the async engine; the sync engine is kept for DDL at startup
+async_engine = create_async_engine(
+    get_async_database_url(DATABASE_URL),
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_pre_ping=True,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_timeout=30
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
+PING_QUERY = sa.text("SELECT 1")
+
+# A successful database ping is reused by /health for HEALTH_DB_TTL seconds
+HEALTH_DB_TTL = float(os.getenv("HEALTH_DB_TTL", "5"))
+_health_cache = {"database_ok_at": 0.0}
+
+def init_database():
+    """Create missing tables in a single transaction"""
+    with engine.begin() as conn:
+        Base.metadata.create_all(bind=conn)
+
+async def ping_database():
+    """Run SELECT 1 on the async pool and remember when it succeeded"""
+    async with async_engine.connect() as conn:
+        await conn.execute(PING_QUERY)
+    _health_cache["database_ok_at"] = time.monotonic()
+
 # Database models
 class DocumentModel(Base):
     __tablename__ = "documents"
@@ -115,8 +181,9 @@ async def lifespan(app: FastAPI):
     global vector_store, index, query_engine, qdrant_client
 
     try:
-        # Initialize database
-        Base.metadata.create_all(bind=engine)
+        # Initialize database and warm the request pool
+        await asyncio.to_thread(init_database)
+        await ping_database()
         logger.info("Database initialized")
 
         # Initialize Qdrant client
@@ -221,6 +288,7 @@ async def lifespan(app: FastAPI):
 
     # Cleanup
     logger.info("Shutting down RAG service")
+    await async_engine.dispose()
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -240,12 +308,9 @@ app.add_middleware(
 )
 
 # Dependency to get database session
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 # Document processing functions
 async def process_pdf(file_content: bytes) -> str:
@@ -305,19 +370,20 @@ async def health_check():
 
     # Check Ollama
     try:
-        import requests
         response = requests.get(f"{OLLAMA_API_BASE}/api/tags", timeout=5)
         services["ollama"] = "healthy" if response.status_code == 200 else "unhealthy"
     except Exception:
         services["ollama"] = "unhealthy"
 
     # Check Database
-    try:
-        with engine.connect() as conn:
-            conn.execute(sa.text("SELECT 1"))
+    if time.monotonic() - _health_cache["database_ok_at"] < HEALTH_DB_TTL:
         services["database"] = "healthy"
-    except Exception:
-        services["database"] = "unhealthy"
+    else:
+        try:
+            await ping_database()
+            services["database"] = "healthy"
+        except Exception:
+            services["database"] = "unhealthy"
 
     status = "healthy" if all(s == "healthy" for s in services.values()) else "partial"
 
@@ -326,7 +392,7 @@ async def health_check():
 @app.post("/documents/upload", response_model=DocumentUploadResponse)
 async def upload_document(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Upload and process a document"""
     global index
@@ -359,7 +425,10 @@ async def upload_document(
         content_hash = hashlib.sha256(content).hexdigest()
 
         # Check if document already exists
-        existing_doc = db.query(DocumentModel).filter(DocumentModel.content_hash == content_hash).first()
+        result = await db.execute(
+            sa.select(DocumentModel).where(DocumentModel.content_hash == content_hash)
+        )
+        existing_doc = result.scalars().first()
         if existing_doc:
             return DocumentUploadResponse(
                 document_id=str(existing_doc.id),
@@ -379,8 +448,8 @@ async def upload_document(
             }
         )
         db.add(doc_record)
-        db.commit()
-        db.refresh(doc_record)
+        await db.commit()
+        await db.refresh(doc_record)
 
         # Process text and add to vector store
         document = Document(
@@ -406,7 +475,7 @@ async def upload_document(
 
     except Exception as e:
         logger.error(f"Error processing document {file.filename}: {e}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error processing document: {e}")
 
 @app.post("/query", response_model=QueryResponse)
@@ -449,9 +518,10 @@ async def query_documents(request: QueryRequest):
         raise HTTPException(status_code=500, detail=f"Error querying documents: {e}")
 
 @app.get("/documents")
-async def list_documents(db: Session = Depends(get_db)):
+async def list_documents(db: AsyncSession = Depends(get_db)):
     """List all uploaded documents"""
-    documents = db.query(DocumentModel).all()
+    result = await db.execute(sa.select(DocumentModel))
+    documents = result.scalars().all()
     return [
         {
             "id": doc.id,
@@ -464,29 +534,29 @@ async def list_documents(db: Session = Depends(get_db)):
     ]
 
 @app.delete("/documents/{document_id}")
-async def delete_document(document_id: int, db: Session = Depends(get_db)):
+async def delete_document(document_id: int, db: AsyncSession = Depends(get_db)):
     """Delete a document from the index"""
-    document = db.query(DocumentModel).filter(DocumentModel.id == document_id).first()
+    document = await db.get(DocumentModel, document_id)
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
 
     try:
         # Note: In a production system, you would also need to remove
         # the corresponding vectors from the vector store
-        db.delete(document)
-        db.commit()
+        await db.delete(document)
+        await db.commit()
 
         return {"message": "Document deleted successfully"}
 
     except Exception as e:
         logger.error(f"Error deleting document: {e}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error deleting document: {e}")
 
 @app.get("/metrics")
 async def metrics():
     """Prometheus metrics endpoint"""
-    return Response(generate_latest(), media_type="text/plain")
+    return Response(await asyncio.to_thread(generate_latest), media_type=CONTENT_TYPE_LATEST)
 
 if __name__ == "__main__":
     uvicorn.run(